@@ -3,83 +3,166 @@ Output capture functionality for logging
 """
 
 import io
-import sys
-from contextlib import contextmanager
-from typing import Optional, TextIO, Generator
-from .core import LoggerFactory
+from contextlib import ExitStack, contextmanager, redirect_stderr, redirect_stdout
+from typing import Callable, Optional, Generator, List
+from .core import _LEVEL_NO, LoggerFactory, _level_enabled
 from logging import Logger
 
+_INFO_NO = _LEVEL_NO["INFO"]
+_ERROR_NO = _LEVEL_NO["ERROR"]
+
+
+def _has_content(text: str) -> bool:
+    """Check for non-whitespace content without allocating a stripped copy"""
+    return bool(text) and not text.isspace()
+
+
+class _ChunkBuffer(io.TextIOBase):
+    """
+    Write-only text buffer that keeps written chunks in a list
+
+    Unlike StringIO it never resizes an internal buffer on write; the
+    chunks are joined once when the value is read. With a threshold, complete
+    lines are handed to ``spill`` whenever that many characters are pending.
+    """
+
+    def __init__(
+        self,
+        threshold: Optional[int] = None,
+        spill: Optional[Callable[[str], None]] = None,
+    ):
+        super().__init__()
+        self._chunks: List[str] = []
+        self._size = 0
+        self._threshold = threshold
+        self._spill = spill
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, s: str) -> int:
+        if self.closed:
+            raise ValueError("I/O operation on closed buffer")
+        if not isinstance(s, str):
+            # Same contract as StringIO; bytes would only fail later in join()
+            raise TypeError(f"string argument expected, got {type(s).__name__!r}")
+        self._chunks.append(s)
+        if self._threshold is not None:
+            self._size += len(s)
+            if self._size >= self._threshold:
+                self._spill_lines()
+        return len(s)
+
+    def _spill_lines(self) -> None:
+        """Pass pending complete lines (or everything, if none) to spill"""
+        data = "".join(self._chunks)
+        cut = data.rfind("\n") + 1 or len(data)
+        tail = data[cut:]
+        self._chunks = [tail] if tail else []
+        self._size = len(tail)
+        self._spill(data[:cut])
+
+    def getvalue(self) -> str:
+        """Return everything written so far"""
+        return "".join(self._chunks)
+
 
 class CaptureOutput:
     """
     Context manager for capturing stdout/stderr and logging the output
     """
 
-    def __init__(self, tag: str, logger: Optional[Logger] = None):
+    def __init__(
+        self,
+        tag: str,
+        logger: Optional[Logger] = None,
+        flush_threshold: Optional[int] = None,
+    ):
         """
         Initialize output capture
 
         Args:
             tag: Logger tag identifier
             logger: Optional pre-configured logger instance
+            flush_threshold: Log captured output in chunks of complete lines
+                once this many characters are pending, instead of only on
+                exit; stdout_content/stderr_content then hold the last chunk
         """
         self.tag = tag
+        self.flush_threshold = flush_threshold
 
-        if logger is None:
-            self.logger = LoggerFactory.create_basic_logger(tag)
-        else:
-            self.logger = logger
+        # The default logger is only built once there is output to log
+        self._logger: Optional[Logger] = logger
 
         # Storage for captured output
-        self._stdout_buffer: Optional[io.StringIO] = None
-        self._stderr_buffer: Optional[io.StringIO] = None
+        self._stdout_buffer: Optional[_ChunkBuffer] = None
+        self._stderr_buffer: Optional[_ChunkBuffer] = None
 
-        # Original streams
-        self._original_stdout: Optional[TextIO] = None
-        self._original_stderr: Optional[TextIO] = None
+        # Restores the original streams on exit
+        self._redirects: Optional[ExitStack] = None
 
         # Captured output
         self.stdout_content: str = ""
         self.stderr_content: str = ""
 
+    @property
+    def logger(self) -> Logger:
+        """Logger receiving the captured output"""
+        if self._logger is None:
+            self._logger = LoggerFactory.create_basic_logger(self.tag)
+        return self._logger
+
+    @logger.setter
+    def logger(self, logger: Logger) -> None:
+        self._logger = logger
+
     def __enter__(self):
         """Start capturing output"""
-        self._stdout_buffer = io.StringIO()
-        self._original_stdout = sys.stdout
-        sys.stdout = self._stdout_buffer
-
-        self._stderr_buffer = io.StringIO()
-        self._original_stderr = sys.stderr
-        sys.stderr = self._stderr_buffer
+        if self.flush_threshold is not None and self._logger is None:
+            # Build the default logger now: created while stdout is redirected,
+            # its console sink would write back into the capture buffer
+            self._logger = LoggerFactory.create_basic_logger(self.tag)
+        self._stdout_buffer = _ChunkBuffer(self.flush_threshold, self._log_stdout)
+        self._stderr_buffer = _ChunkBuffer(self.flush_threshold, self._log_stderr)
+
+        with ExitStack() as stack:
+            stack.enter_context(redirect_stdout(self._stdout_buffer))
+            stack.enter_context(redirect_stderr(self._stderr_buffer))
+            self._redirects = stack.pop_all()
 
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
         """Stop capturing and log the output"""
         # Restore original streams
-        if self._original_stdout:
-            sys.stdout = self._original_stdout
-            if self._stdout_buffer:
-                self.stdout_content = self._stdout_buffer.getvalue()
-                self._stdout_buffer.close()
+        if self._redirects is not None:
+            self._redirects.close()
+            self._redirects = None
+
+        if self._stdout_buffer is not None:
+            self.stdout_content = self._stdout_buffer.getvalue()
+            self._stdout_buffer.close()
+
+        if self._stderr_buffer is not None:
+            self.stderr_content = self._stderr_buffer.getvalue()
+            self._stderr_buffer.close()
 
-        if self._original_stderr:
-            sys.stderr = self._original_stderr
-            if self._stderr_buffer:
-                self.stderr_content = self._stderr_buffer.getvalue()
-                self._stderr_buffer.close()
+        self._log_stdout(self.stdout_content)
+        self._log_stderr(self.stderr_content)
 
-        # Log captured content
-        if self.stdout_content.strip():
-            self.logger.info(f"Captured stdout: {self.stdout_content.strip()}")
+    # Both skip the formatting for disabled levels
+    def _log_stdout(self, text: str) -> None:
+        if _has_content(text) and _level_enabled(self.logger, _INFO_NO):
+            self.logger.info(f"Captured stdout: {text.strip()}")
 
-        if self.stderr_content.strip():
-            self.logger.error(f"Captured stderr: {self.stderr_content.strip()}")
+    def _log_stderr(self, text: str) -> None:
+        if _has_content(text) and _level_enabled(self.logger, _ERROR_NO):
+            self.logger.error(f"Captured stderr: {text.strip()}")
 
 
 @contextmanager
 def capture_output(
-    tag: str, logger: Optional[Logger] = None
+    tag: str, logger: Optional[Logger] = None, flush_threshold: Optional[int] = None
 ) -> Generator[CaptureOutput, None, None]:
     """
     Context manager for capturing both stdout and stderr
@@ -87,9 +170,10 @@ def capture_output(
     Args:
         tag: Logger tag identifier
         logger: Optional pre-configured logger instance
+        flush_threshold: See CaptureOutput
 
     Yields:
         CaptureOutput instance
     """
-    with CaptureOutput(tag, logger) as capture:
+    with CaptureOutput(tag, logger, flush_threshold) as capture:
         yield capture
@@ -3,15 +3,68 @@ Core logging functionality using Factory and Builder patterns
 """
 
 from logging import Logger
+import os
+import queue
 import sys
-from typing import Optional, Dict, Any
+import threading
+import weakref
+from collections import OrderedDict
+from dataclasses import astuple
+from typing import Optional, Dict, Any, List, TextIO, Tuple, Union
 from loguru import logger as _logger
 from .sls import SLSConfig, SLSPropagateHandler
 
+try:
+    # loguru's file sink expands placeholders such as "{time}" in the path,
+    # as logger.add(path) does; it is private API, hence the fallback below
+    from loguru._file_sink import FileSink as _FileSink
+except ImportError:  # pragma: no cover
+    _FileSink = None
+
+
+# Severity numbers of loguru's built-in levels
+_LEVEL_NO = {
+    "DEBUG": 10,
+    "INFO": 20,
+    "SUCCESS": 25,
+    "WARNING": 30,
+    "ERROR": 40,
+    "CRITICAL": 50,
+}
+
+_LoguruLogger = type(_logger)
+# loguru drops records below _core.min_level before building them; that is
+# private API, so the gate below is disabled if a loguru release removes it
+_HAS_MIN_LEVEL = isinstance(
+    getattr(getattr(_logger, "_core", None), "min_level", None), int
+)
+
+
+def _level_enabled(logger, level_no: int) -> bool:
+    """Check whether any loguru handler accepts the level; assume yes otherwise"""
+    if not _HAS_MIN_LEVEL or not isinstance(logger, _LoguruLogger):
+        return True
+    return level_no >= logger._core.min_level
+
 
 class LoggerConfig:
     """Logger configuration data class"""
 
+    __slots__ = (
+        "tag",
+        "level",
+        "format",
+        "console_enabled",
+        "file_enabled",
+        "file_path",
+        "file_enqueue",
+        "sls_enabled",
+        "sls_config",
+        "extra",
+        "queue_size",
+        "overflow_policy",
+    )
+
     def __init__(self):
         self.tag: str = ""
         self.level: str = "INFO"
@@ -19,14 +72,224 @@ class LoggerConfig:
         self.console_enabled: bool = True
         self.file_enabled: bool = False
         self.file_path: Optional[str] = None
+        self.file_enqueue: bool = True
         self.sls_enabled: bool = False
         self.sls_config: Optional[SLSConfig] = None
         self.extra: Dict[str, Any] = {}
+        self.queue_size: int = 10000
+        self.overflow_policy: str = "block"
+
+
+def _open_log_file(file_path: str) -> TextIO:
+    """Open a log file for appending, creating its directory if needed"""
+    if _FileSink is not None:
+        # The sink resolves the path and opens the file right away; without
+        # rotation or retention it is nothing more than that file
+        stream = getattr(_FileSink(file_path), "_file", None)
+        if stream is not None:
+            return stream
+    if "{" in file_path:
+        raise ValueError(f"Cannot expand placeholders in log file path {file_path!r}")
+
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return open(file_path, "a", encoding="utf-8")
+
+
+# Queued sinks that are running, so a forked child can restart their workers
+_LIVE_SINKS: "weakref.WeakSet[QueuedSink]" = weakref.WeakSet()
+
+
+def _restart_sinks_in_child() -> None:
+    """Give every running queued sink a fresh queue and worker after fork()"""
+    for sink in list(_LIVE_SINKS):
+        sink._start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_sinks_in_child)
+
+
+class QueuedSink:
+    """
+    Bounded queue in front of a text stream
+
+    loguru calls write() in the logging thread, which only enqueues the
+    formatted message; a background thread drains the queue and writes the
+    messages to the wrapped stream in batches. Replaces loguru's
+    ``enqueue=True`` (an unbounded multiprocessing queue) for in-process use.
+    """
+
+    OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_new")
+
+    def __init__(
+        self,
+        stream: TextIO,
+        queue_size: int = 10000,
+        overflow_policy: str = "block",
+        close_stream: bool = False,
+    ):
+        """
+        Initialize queued sink
+
+        Args:
+            stream: Target stream to write formatted messages to
+            queue_size: Maximum number of pending messages, 0 for unbounded
+            overflow_policy: What to do when the queue is full: block the
+                caller, drop the oldest pending message or drop the new one
+            close_stream: Close the stream when the sink is stopped
+        """
+        if overflow_policy not in self.OVERFLOW_POLICIES:
+            raise ValueError(
+                f"overflow_policy must be one of {self.OVERFLOW_POLICIES}, "
+                f"got {overflow_policy!r}"
+            )
+
+        self._stream = stream
+        self._overflow_policy = overflow_policy
+        self._close_stream = close_stream
+        self._queue_size = max(0, queue_size)
+        self._start()
+        _LIVE_SINKS.add(self)
+
+    def _start(self) -> None:
+        """Start the worker thread on an empty queue"""
+        # Also runs in a forked child, which inherits no threads; messages
+        # still pending there belong to the parent, which writes them itself
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue(
+            maxsize=self._queue_size
+        )
+        self._worker = threading.Thread(
+            target=self._run, name="ulogger-sink", daemon=True
+        )
+        self._worker.start()
+
+    @classmethod
+    def open_file(
+        cls, file_path: str, queue_size: int = 10000, overflow_policy: str = "block"
+    ) -> "QueuedSink":
+        """Create a queued sink appending to the given file"""
+        stream = _open_log_file(file_path)
+        return cls(stream, queue_size, overflow_policy, close_stream=True)
+
+    def write(self, message: str) -> None:
+        """Enqueue a formatted message according to the overflow policy"""
+        if self._overflow_policy == "block":
+            self._queue.put(message)
+            return
+
+        while True:
+            try:
+                self._queue.put_nowait(message)
+                return
+            except queue.Full:
+                if self._overflow_policy == "drop_new":
+                    return
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            else:
+                self._queue.task_done()
+
+    def isatty(self) -> bool:
+        """Let loguru decide on colorization from the wrapped stream"""
+        try:
+            return self._stream.isatty()
+        except Exception:
+            return False
+
+    def complete(self) -> None:
+        """Block until every message written so far has reached the stream"""
+        # loguru's logger.complete() only awaits coroutine complete() methods,
+        # so it does not reach this one; LoggerFactory.shutdown() stops (and
+        # thereby drains) the sinks it owns
+        if self._worker.is_alive():
+            self._queue.join()
+
+    def stop(self) -> None:
+        """Drain pending messages and stop the background thread"""
+        if not self._worker.is_alive():
+            return
+        _LIVE_SINKS.discard(self)
+        self._queue.put(None)
+        self._worker.join()
+        if self._close_stream:
+            self._stream.close()
+
+    def _run(self) -> None:
+        while True:
+            batch: List[Optional[str]] = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            messages = [message for message in batch if message is not None]
+            if messages:
+                self._write("".join(messages))
+            for _ in batch:
+                self._queue.task_done()
+
+            if None in batch:
+                return
+
+    def _write(self, data: str) -> None:
+        try:
+            self._stream.write(data)
+            self._stream.flush()
+        except Exception as e:
+            # Not through logging: this sink may be where logging ends up
+            stderr = sys.stderr or sys.__stderr__
+            if stderr is not None:
+                try:
+                    stderr.write(f"Failed to write log output: {e}\n")
+                except Exception:
+                    pass
+
+
+class DirectSink:
+    """
+    Unqueued file sink
+
+    Writes and flushes each message in the logging thread, so a record is on
+    disk once the log call returns.
+    """
+
+    def __init__(self, stream: TextIO, close_stream: bool = False):
+        """
+        Initialize direct sink
+
+        Args:
+            stream: Target stream to write formatted messages to
+            close_stream: Close the stream when the sink is stopped
+        """
+        self._stream = stream
+        self._close_stream = close_stream
+
+    @classmethod
+    def open_file(cls, file_path: str) -> "DirectSink":
+        """Create a direct sink appending to the given file"""
+        return cls(_open_log_file(file_path), close_stream=True)
+
+    def write(self, message: str) -> None:
+        """Write and flush a formatted message"""
+        self._stream.write(message)
+        self._stream.flush()
+
+    def stop(self) -> None:
+        """Close the stream if the sink owns it"""
+        if self._close_stream and not self._stream.closed:
+            self._stream.close()
 
 
 class LoggerBuilder:
     """Builder pattern for creating configured loggers"""
 
+    __slots__ = ("_config",)
+
     def __init__(self):
         self._config = LoggerConfig()
 
@@ -50,10 +313,24 @@ class LoggerBuilder:
         self._config.console_enabled = enabled
         return self
 
-    def with_file(self, file_path: str) -> "LoggerBuilder":
-        """Enable file output"""
+    def with_file(self, file_path: str, enqueue: bool = True) -> "LoggerBuilder":
+        """Enable file output (written synchronously when enqueue is False)"""
         self._config.file_enabled = True
         self._config.file_path = file_path
+        self._config.file_enqueue = enqueue
+        return self
+
+    def with_queue(
+        self, queue_size: int, overflow_policy: str = "block"
+    ) -> "LoggerBuilder":
+        """Set sink queue size and overflow policy"""
+        if overflow_policy not in QueuedSink.OVERFLOW_POLICIES:
+            raise ValueError(
+                f"overflow_policy must be one of {QueuedSink.OVERFLOW_POLICIES}, "
+                f"got {overflow_policy!r}"
+            )
+        self._config.queue_size = queue_size
+        self._config.overflow_policy = overflow_policy
         return self
 
     def with_sls(self, sls_config: SLSConfig) -> "LoggerBuilder":
@@ -75,36 +352,186 @@ class LoggerBuilder:
 class LoggerFactory:
     """Factory for creating different types of loggers"""
 
-    @staticmethod
-    def create_logger(config: LoggerConfig) -> Logger:
-        """Create logger based on configuration"""
-        # Remove existing handlers
-        _logger.remove()
-
-        # Bind tag and extra data to logger
-        bound_logger = _logger.bind(tag=config.tag, **config.extra)
-
-        # Add console handler if enabled
-        if config.console_enabled:
-            bound_logger.add(
-                sys.stdout, format=config.format, level=config.level, enqueue=True
-            )
+    _CACHE_SIZE = 256
 
-        # Add file handler if enabled
-        if config.file_enabled and config.file_path:
-            bound_logger.add(
-                config.file_path, format=config.format, level=config.level, enqueue=True
-            )
+    _lock = threading.RLock()
+    _handler_ids: List[int] = []
+    _sink_key: Optional[Tuple[Any, ...]] = None
+    _default_removed = False
+    _cache: "OrderedDict[Tuple[Any, ...], Logger]" = OrderedDict()
+    # (tag, level, stdout) -> (sink key it was built under, logger)
+    _basic_cache: Dict[Tuple[Any, ...], Tuple[Tuple[Any, ...], Logger]] = {}
+
+    @classmethod
+    def create_logger(cls, config: LoggerConfig) -> Logger:
+        """Create logger based on configuration, reusing cached loggers"""
+        sink_key = cls._make_sink_key(config)
+        cache_key = cls._make_cache_key(config, sink_key)
 
-        # Add SLS handler if enabled
-        if config.sls_enabled and config.sls_config:
-            sls_handler = SLSPropagateHandler.create(config.sls_config)
-            if sls_handler:
-                bound_logger.add(sls_handler, format="{message}", level=config.level)
+        with cls._lock:
+            # Sinks are shared by every bound logger, so they are only
+            # rebuilt when a different sink set is requested; per-tag
+            # differences are handled by bind()
+            if sink_key != cls._sink_key:
+                cls._configure_sinks(config, sink_key)
 
-        return bound_logger
+            if cache_key is not None and cache_key in cls._cache:
+                cls._cache.move_to_end(cache_key)
+                return cls._cache[cache_key]
+
+            # Bind tag and extra data to logger
+            bound_logger = _logger.bind(tag=config.tag, **config.extra)
+
+            if cache_key is not None:
+                cls._cache[cache_key] = bound_logger
+                if len(cls._cache) > cls._CACHE_SIZE:
+                    cls._cache.popitem(last=False)
+
+            return bound_logger
+
+    @classmethod
+    def _configure_sinks(cls, config: LoggerConfig, sink_key: Tuple[Any, ...]) -> None:
+        """Replace the handlers owned by the factory with those of the config"""
+        # Remove handlers added by previous builds (and loguru's default one)
+        if not cls._default_removed:
+            _logger.remove()
+            cls._default_removed = True
+        for handler_id in cls._handler_ids:
+            try:
+                _logger.remove(handler_id)
+            except ValueError:
+                pass
+        cls._handler_ids = []
+        # Only recorded once every sink is in place, so a failed build is
+        # retried by the next create_logger() instead of being cached
+        cls._sink_key = None
+
+        handler_ids: List[int] = []
+        complete = True
+        try:
+            # Add console handler if enabled
+            if config.console_enabled:
+                console_sink = QueuedSink(
+                    sys.stdout, config.queue_size, config.overflow_policy
+                )
+                handler_ids.append(
+                    cls._add_sink(
+                        console_sink, format=config.format, level=config.level
+                    )
+                )
+
+            # Add file handler if enabled
+            if config.file_enabled and config.file_path:
+                file_sink: Union[QueuedSink, DirectSink]
+                if config.file_enqueue:
+                    file_sink = QueuedSink.open_file(
+                        config.file_path, config.queue_size, config.overflow_policy
+                    )
+                else:
+                    file_sink = DirectSink.open_file(config.file_path)
+                handler_ids.append(
+                    cls._add_sink(
+                        file_sink,
+                        format=config.format,
+                        level=config.level,
+                        colorize=False,
+                    )
+                )
+
+            # Add SLS handler if enabled
+            if config.sls_enabled and config.sls_config:
+                sls_handler = SLSPropagateHandler.create(config.sls_config)
+                if sls_handler:
+                    handler_ids.append(
+                        _logger.add(sls_handler, format="{message}", level=config.level)
+                    )
+                else:
+                    # create() already logged why; try again on the next build
+                    complete = False
+        except Exception:
+            for handler_id in handler_ids:
+                _logger.remove(handler_id)
+            raise
+
+        cls._handler_ids = handler_ids
+        if complete:
+            cls._sink_key = sink_key
 
     @staticmethod
-    def create_basic_logger(tag: str = "default", level: str = "INFO"):
+    def _add_sink(sink: Union[QueuedSink, DirectSink], **kwargs: Any) -> int:
+        """Add a sink to loguru, stopping it if loguru rejects it"""
+        try:
+            return _logger.add(sink, **kwargs)
+        except Exception:
+            sink.stop()
+            raise
+
+    @staticmethod
+    def _make_sink_key(config: LoggerConfig) -> Tuple[Any, ...]:
+        """Describe the set of sinks a config produces"""
+        return (
+            config.level,
+            config.format,
+            # Console output goes to whatever sys.stdout is at build time
+            sys.stdout if config.console_enabled else None,
+            (config.file_path, config.file_enqueue) if config.file_enabled else None,
+            astuple(config.sls_config)
+            if config.sls_enabled and config.sls_config
+            else None,
+            config.queue_size,
+            config.overflow_policy,
+        )
+
+    @staticmethod
+    def _make_cache_key(
+        config: LoggerConfig, sink_key: Tuple[Any, ...]
+    ) -> Optional[Tuple[Any, ...]]:
+        """Build the cache key, or None when extra data is not hashable"""
+        key = (sink_key, config.tag, tuple(sorted(config.extra.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    @classmethod
+    def invalidate(cls, tag: Optional[str] = None) -> None:
+        """Drop cached loggers for the given tag, or all of them"""
+        with cls._lock:
+            if tag is None:
+                cls._cache.clear()
+                cls._basic_cache.clear()
+                return
+            for key in [key for key in cls._cache if key[1] == tag]:
+                del cls._cache[key]
+            for key in [key for key in cls._basic_cache if key[0] == tag]:
+                del cls._basic_cache[key]
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """Remove all handlers, draining queued sinks before returning"""
+        with cls._lock:
+            _logger.remove()
+            cls._handler_ids = []
+            cls._sink_key = None
+            cls._cache.clear()
+            cls._basic_cache.clear()
+
+    @classmethod
+    def create_basic_logger(cls, tag: str = "default", level: str = "INFO"):
         """Create a basic logger with minimal configuration"""
-        return LoggerBuilder().with_tag(tag).with_level(level).with_console().build()
+        # Skip the builder while the sinks it was created with are still
+        # active; any other build replaces the sink key object
+        key = (tag, level, sys.stdout)
+        cached = cls._basic_cache.get(key)
+        if cached is not None and cached[0] is cls._sink_key:
+            return cached[1]
+
+        with cls._lock:
+            logger = (
+                LoggerBuilder().with_tag(tag).with_level(level).with_console().build()
+            )
+            if len(cls._basic_cache) >= cls._CACHE_SIZE:
+                cls._basic_cache.clear()
+            cls._basic_cache[key] = (cls._sink_key, logger)
+        return logger
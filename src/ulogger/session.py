@@ -4,7 +4,7 @@ Session-based logging functionality
 
 from logging import Logger
 from typing import Optional
-from .core import LoggerFactory
+from .core import _LEVEL_NO, LoggerFactory, _level_enabled
 
 
 class SessionLogger:
@@ -30,6 +30,28 @@ class SessionLogger:
         else:
             self.logger = logger
 
+    @property
+    def logger(self) -> Logger:
+        """Underlying logger instance"""
+        return self._logger
+
+    @logger.setter
+    def logger(self, logger: Logger) -> None:
+        self._logger = logger
+        # opt() allocates a new logger, so do it once per logger change
+        self._opt_logger = logger.opt(depth=2)
+
+    @property
+    def session_id(self) -> str:
+        """Unique session identifier"""
+        return self._session_id
+
+    @session_id.setter
+    def session_id(self, session_id: str) -> None:
+        self._session_id = session_id
+        # Static message prefix, precomputed once per session
+        self._prefix = f"session={session_id} event="
+
     @classmethod
     def create(cls, tag: str, session_id: str) -> "SessionLogger":
         """Factory method to create a basic session logger"""
@@ -37,54 +59,75 @@ class SessionLogger:
 
     def _format_message(self, event: str, content: str = "", **kwargs) -> str:
         """Format structured log message"""
-        parts = [f"session={self.session_id}", f'event="{event}"']
+        head = f'{self._prefix}"{event}"'
+        if not content and not kwargs:
+            return head
 
+        parts = [head]
         if content:
             parts.append(f'content="{content}"')
 
         # Add any additional key-value pairs
-        for key, value in kwargs.items():
-            if isinstance(value, str):
-                parts.append(f'{key}="{value}"')
-            else:
-                parts.append(f"{key}={value}")
+        if kwargs:
+            parts += [
+                f'{key}="{value}"' if isinstance(value, str) else f"{key}={value}"
+                for key, value in kwargs.items()
+            ]
 
         return " ".join(parts)
 
+    def _is_enabled(self, level: str) -> bool:
+        """Check whether any handler accepts the level before formatting"""
+        return _level_enabled(self._logger, _LEVEL_NO[level])
+
     def info(self, event: str, content: str = "", **kwargs):
         """Log info level message with session context"""
+        if not self._is_enabled("INFO"):
+            return
         message = self._format_message(event, content, **kwargs)
-        self.logger.opt(depth=2).info(message)
+        self._opt_logger.info(message)
 
     def debug(self, event: str, content: str = "", **kwargs):
         """Log debug level message with session context"""
+        if not self._is_enabled("DEBUG"):
+            return
         message = self._format_message(event, content, **kwargs)
-        self.logger.opt(depth=2).debug(message)
+        self._opt_logger.debug(message)
 
     def warning(self, event: str, content: str = "", **kwargs):
         """Log warning level message with session context"""
+        if not self._is_enabled("WARNING"):
+            return
         message = self._format_message(event, content, **kwargs)
-        self.logger.opt(depth=2).warning(message)
+        self._opt_logger.warning(message)
 
     def error(self, event: str, content: str = "", **kwargs):
         """Log error level message with session context"""
+        if not self._is_enabled("ERROR"):
+            return
         message = self._format_message(event, content, **kwargs)
-        self.logger.opt(depth=2).error(message)
+        self._opt_logger.error(message)
 
     def success(self, event: str, content: str = "", **kwargs):
         """Log success level message with session context"""
+        if not self._is_enabled("SUCCESS"):
+            return
         message = self._format_message(event, content, **kwargs)
-        self.logger.opt(depth=2).success(message)
+        self._opt_logger.success(message)
 
     def critical(self, event: str, content: str = "", **kwargs):
         """Log critical level message with session context"""
+        if not self._is_enabled("CRITICAL"):
+            return
         message = self._format_message(event, content, **kwargs)
-        self.logger.opt(depth=2).critical(message)
+        self._opt_logger.critical(message)
 
     def exception(self, event: str, content: str = "", **kwargs):
         """Log exception with session context"""
+        if not self._is_enabled("ERROR"):
+            return
         message = self._format_message(event, content, **kwargs)
-        self.logger.opt(depth=2).exception(message)
+        self._opt_logger.exception(message)
 
     def bind(self, **kwargs):
         """Bind additional context to the logger"""
@@ -1,15 +1,71 @@
 """SLS (Simple Log Service) integration for Alibaba Cloud."""
 
 import hashlib
+import itertools
 import json
 import logging
 import os
 import secrets
 import socket
+import sys
 import threading
 import time
+import weakref
+from collections import deque
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional speedup, see the "fast" extra
+    orjson = None
+
+# Diagnostics go to the standard logging module rather than loguru so they
+# are never routed back into the SLS sink itself
+_module_logger = logging.getLogger(__name__)
+
+# Used for exception text when the handler has no formatter of its own
+_EXC_FORMATTER = logging.Formatter()
+
+
+def _json_dumps(value) -> str:
+    """
+    Serialize to JSON, preferring orjson when it is installed
+
+    Both paths emit the same compact text for JSON-native values (dicts with
+    str/int/float/bool/None keys, lists, scalars). orjson additionally
+    encodes datetime, UUID, enum and dataclass values natively, where the
+    stdlib raises and callers fall back to repr().
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        except TypeError:
+            # e.g. integers beyond 64 bits; let the stdlib encoder decide
+            pass
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+# Exact types _serialize_value can pass to str() directly (str() returns an
+# exact str unchanged); subclasses take the isinstance path
+_SCALAR_TYPES = frozenset((str, int, float, bool))
+
+
+# False only on free-threaded (PEP 703) builds running without the GIL
+_GIL_ENABLED = getattr(sys, "_is_gil_enabled", lambda: True)()
+
+# aliyun.log.logexception.LogException, resolved on first use
+_LogException: Optional[type] = None
+
+
+def _get_log_exception() -> type:
+    """Return the SDK LogException class, importing it only once"""
+    global _LogException
+    if _LogException is None:
+        from aliyun.log.logexception import LogException
+
+        _LogException = LogException
+    return _LogException
 
 
 class PackIdGenerator:
@@ -18,16 +74,21 @@ class PackIdGenerator:
     _PREFIX_LENGTH = 16
 
     def __init__(self, prefix: Optional[str] = None) -> None:
-        self._lock = threading.Lock()
-        self._counter = 0
-        self._prefix = (prefix or self._build_prefix()).upper()
+        # next() on itertools.count is atomic under the GIL; free-threaded
+        # builds still need a lock around it
+        self._lock = None if _GIL_ENABLED else threading.Lock()
+        self._counter = itertools.count(1)
+        # "<prefix>-" is fixed, so generate() only formats the sequence number
+        self._prefix_dash = (prefix or self._build_prefix()).upper() + "-"
 
     def generate(self) -> str:
         """生成新的 PackId，格式为 <前缀>-<递增十六进制序号>"""
-        with self._lock:
-            self._counter += 1
-            sequence = self._counter
-        return f"{self._prefix}-{sequence:X}"
+        if self._lock is None:
+            sequence = next(self._counter)
+        else:
+            with self._lock:
+                sequence = next(self._counter)
+        return self._prefix_dash + "%X" % sequence
 
     def _build_prefix(self) -> str:
         hostname = socket.gethostname()
@@ -35,8 +96,22 @@ class PackIdGenerator:
         now_ns = time.time_ns()
         entropy = secrets.token_hex(8)
         payload = f"{hostname}|{pid}|{now_ns}|{entropy}".encode("utf-8")
-        digest = hashlib.sha256(payload).hexdigest().upper()
-        return digest[: self._PREFIX_LENGTH]
+        # hashlib.sha256 is already OpenSSL-backed; only hex-encode the bytes we keep
+        digest = hashlib.sha256(payload).digest()[: self._PREFIX_LENGTH // 2]
+        return digest.hex().upper()
+
+
+# SLSConfig fields that must be non-empty to reach SLS
+_REQUIRED_FIELDS = (
+    "endpoint",
+    "access_key_id",
+    "access_key_secret",
+    "project",
+    "logstore",
+)
+
+# Accepted values of SLSConfig.ensure_logstore
+_ENSURE_LOGSTORE_MODES = ("sync", "background", "skip")
 
 
 @dataclass
@@ -49,23 +124,47 @@ class SLSConfig:
     project: str = ""
     logstore: str = ""
     service_name: str = ""
+    # Also send all extras as one JSON "extra" field next to the flattened keys
+    include_extra_json: bool = True
+    # How create() makes sure the logstore exists: "sync" checks before
+    # returning, "background" checks on a thread while records queue up,
+    # "skip" assumes it is already provisioned
+    ensure_logstore: str = "sync"
+    # Records per PutLogs request and the longest a record waits to be sent
+    batch_size: int = 128
+    flush_interval: float = 0.5
+
+    def __setattr__(self, name: str, value) -> None:
+        if name == "ensure_logstore" and value not in _ENSURE_LOGSTORE_MODES:
+            raise ValueError(
+                f"ensure_logstore must be one of {_ENSURE_LOGSTORE_MODES}, "
+                f"got {value!r}"
+            )
+        super().__setattr__(name, value)
+        # Any field change invalidates the memoized is_valid() result
+        self.__dict__.pop("_valid", None)
 
     def is_valid(self) -> bool:
         """Check if all required fields are present"""
-        return all(
-            [
-                self.endpoint,
-                self.access_key_id,
-                self.access_key_secret,
-                self.project,
-                self.logstore,
-            ]
-        )
+        valid = self.__dict__.get("_valid")
+        if valid is None:
+            valid = not self.missing_fields()
+            self.__dict__["_valid"] = valid
+        return valid
+
+    def missing_fields(self) -> List[str]:
+        """Names of the required fields that are still empty"""
+        return [name for name in _REQUIRED_FIELDS if not getattr(self, name)]
 
 
 class SLSClient:
     """阿里云 SLS 客户端工具类"""
 
+    # (endpoint, project, logstore) already ensured in this process, so
+    # rebuilding a handler for the same logstore skips the PutProject and
+    # CreateLogStore round trips
+    _ensured: Set[Tuple[str, str, str]] = set()
+
     def __init__(self, config: SLSConfig):
         self.config = config
         self._client = None
@@ -83,7 +182,9 @@ class SLSClient:
                     accessKey=self.config.access_key_secret,
                 )
             except ImportError:
-                print("aliyun-log-python-sdk not installed, SLS client unavailable")
+                _module_logger.warning(
+                    "aliyun-log-python-sdk not installed, SLS client unavailable"
+                )
                 return None
         return self._client
 
@@ -93,19 +194,19 @@ class SLSClient:
             return False
 
         try:
-            from aliyun.log.logexception import LogException
+            LogException = _get_log_exception()
 
             self.client.get_project(self.config.project)
             return True
         except LogException as e:
             if "ProjectNotExist" in str(e):
-                print(f"Project {self.config.project} does not exist")
+                _module_logger.warning("Project %s does not exist", self.config.project)
                 return False
             else:
-                print(f"Error checking project: {e}")
+                _module_logger.error("Error checking project: %s", e)
                 raise e
         except Exception as e:
-            print(f"Unexpected error checking project: {e}")
+            _module_logger.error("Unexpected error checking project: %s", e)
             return False
 
     def create_project(self, description: str = "Auto created project") -> bool:
@@ -114,20 +215,20 @@ class SLSClient:
             return False
 
         try:
-            from aliyun.log.logexception import LogException
+            LogException = _get_log_exception()
 
             self.client.create_project(self.config.project, description)
-            print(f"Project {self.config.project} created successfully")
+            _module_logger.info("Project %s created successfully", self.config.project)
             return True
         except LogException as e:
             if "ProjectAlreadyExist" in str(e):
-                print(f"Project {self.config.project} already exists")
+                _module_logger.info("Project %s already exists", self.config.project)
                 return True
             else:
-                print(f"Error creating project: {e}")
+                _module_logger.error("Error creating project: %s", e)
                 return False
         except Exception as e:
-            print(f"Unexpected error creating project: {e}")
+            _module_logger.error("Unexpected error creating project: %s", e)
             return False
 
     def check_logstore_exists(self) -> bool:
@@ -136,21 +237,23 @@ class SLSClient:
             return False
 
         try:
-            from aliyun.log.logexception import LogException
+            LogException = _get_log_exception()
 
             self.client.get_logstore(self.config.project, self.config.logstore)
             return True
         except LogException as e:
             if "LogStoreNotExist" in str(e):
-                print(
-                    f"Logstore {self.config.logstore} does not exist in project {self.config.project}"
+                _module_logger.warning(
+                    "Logstore %s does not exist in project %s",
+                    self.config.logstore,
+                    self.config.project,
                 )
                 return False
             else:
-                print(f"Error checking logstore: {e}")
+                _module_logger.error("Error checking logstore: %s", e)
                 raise e
         except Exception as e:
-            print(f"Unexpected error checking logstore: {e}")
+            _module_logger.error("Unexpected error checking logstore: %s", e)
             return False
 
     def create_logstore(self, ttl: int = 30, shard_count: int = 2) -> bool:
@@ -165,7 +268,7 @@ class SLSClient:
             return False
 
         try:
-            from aliyun.log.logexception import LogException
+            LogException = _get_log_exception()
 
             self.client.create_logstore(
                 project_name=self.config.project,
@@ -173,19 +276,21 @@ class SLSClient:
                 ttl=ttl,
                 shard_count=shard_count,
             )
-            print(
-                f"Logstore {self.config.logstore} created successfully in project {self.config.project}"
+            _module_logger.info(
+                "Logstore %s created successfully in project %s",
+                self.config.logstore,
+                self.config.project,
             )
             return True
         except LogException as e:
             if "LogStoreAlreadyExist" in str(e):
-                print(f"Logstore {self.config.logstore} already exists")
+                _module_logger.info("Logstore %s already exists", self.config.logstore)
                 return True
             else:
-                print(f"Error creating logstore: {e}")
+                _module_logger.error("Error creating logstore: %s", e)
                 return False
         except Exception as e:
-            print(f"Unexpected error creating logstore: {e}")
+            _module_logger.error("Unexpected error creating logstore: %s", e)
             return False
 
     def ensure_logstore_exists(
@@ -208,30 +313,125 @@ class SLSClient:
         try:
             # 检查配置是否完整
             if not self.config.is_valid():
-                print("SLS configuration is incomplete")
+                _module_logger.warning("SLS configuration is incomplete")
                 return False
 
+            key = (self.config.endpoint, self.config.project, self.config.logstore)
+            if key in self._ensured:
+                return True
+
+            # 先检查再创建：常见情况下资源已存在，只需读权限即可通过
             # 确保项目存在
             if not self.check_project_exists():
                 if not self.create_project(project_description):
-                    print("Failed to create project")
+                    _module_logger.error("Failed to create project")
                     return False
 
             # 确保 logstore 存在
             if not self.check_logstore_exists():
                 if not self.create_logstore(ttl, shard_count):
-                    print("Failed to create logstore")
+                    _module_logger.error("Failed to create logstore")
                     return False
 
+            self._ensured.add(key)
             return True
 
         except Exception as e:
-            print(f"Error ensuring logstore exists: {e}")
+            _module_logger.error("Error ensuring logstore exists: %s", e)
             return False
 
 
+# Queued record: (contents, seconds, nano_part, estimated size in bytes)
+_QueueEntry = Tuple[List[Tuple[str, str]], int, int, int]
+
+
+class _SLSDispatcher:
+    """
+    Process-wide flush thread shared by every SLSPropagateHandler
+
+    Handlers wake the dispatcher when a batch fills up or their queue stops
+    being empty; the dispatcher sleeps until the nearest flush deadline of
+    all registered handlers.
+    """
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._handlers: "weakref.WeakSet[SLSPropagateHandler]" = weakref.WeakSet()
+        self._thread: Optional[threading.Thread] = None
+        self._woken = False
+
+    def register(self, handler: "SLSPropagateHandler") -> None:
+        with self._condition:
+            self._handlers.add(handler)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="ulogger-sls-dispatcher", daemon=True
+                )
+                self._thread.start()
+
+    def unregister(self, handler: "SLSPropagateHandler") -> None:
+        with self._condition:
+            self._handlers.discard(handler)
+
+    def wake(self) -> None:
+        with self._condition:
+            self._woken = True
+            self._condition.notify()
+
+    def _after_fork_in_child(self) -> None:
+        """Forget the parent's thread and locks; handlers re-register on emit"""
+        handlers = list(self._handlers)
+        self._condition = threading.Condition()
+        self._handlers = weakref.WeakSet()
+        self._thread = None
+        self._woken = False
+        for handler in handlers:
+            handler._reset_after_fork()
+
+    def _run(self) -> None:
+        timeout: Optional[float] = None
+        while True:
+            with self._condition:
+                if not self._woken:
+                    self._condition.wait(timeout)
+                self._woken = False
+                handlers = list(self._handlers)
+
+            timeout = None
+            now = time.monotonic()
+            for handler in handlers:
+                delay = handler._service(now)
+                if delay is not None and (timeout is None or delay < timeout):
+                    timeout = delay
+
+
+_DISPATCHER = _SLSDispatcher()
+
+if hasattr(os, "register_at_fork"):
+    # A forked child inherits no threads, so the dispatcher must start anew
+    os.register_at_fork(after_in_child=_DISPATCHER._after_fork_in_child)
+
+
 class SLSPropagateHandler(logging.Handler):
-    """自定义日志 Handler，使用阿里云 SDK 直接写入 SLS，支持纳秒级时间戳"""
+    """
+    自定义日志 Handler，使用阿里云 SDK 批量写入 SLS，支持纳秒级时间戳
+
+    emit 只负责把记录转换为日志内容并放入有界队列，所有 Handler 共用的
+    后台线程在攒够 batch_size 条、max_batch_bytes 字节或最早的记录等待满
+    flush_interval 秒时(先到者为准)合并为 PutLogs 请求发送，失败时按指数退避重试。
+    """
+
+    # Thread safety: the queue, byte and drop counters, in-flight count,
+    # retries and the closed/failed flags are only touched under
+    # self._condition, and put_logs is the only work done outside it. The
+    # unlocked _int_strings and _supports_nano are memos a race merely refills.
+    _OVERFLOW_POLICIES = ("drop_oldest", "block")
+    # PutLogs accepts at most 4096 logs and 5 MB per request
+    _MAX_BATCH_SIZE = 4096
+    _MAX_BATCH_BYTES = 5 * 1024 * 1024
+    # Longest flush() waits for a background logstore bootstrap
+    _BOOTSTRAP_WAIT = 30.0
+    _INT_STRINGS_MAX = 1024
 
     def __init__(
         self,
@@ -240,81 +440,441 @@ class SLSPropagateHandler(logging.Handler):
         log_item_cls,
         put_logs_request_cls,
         log_exception_cls,
+        batch_size: int = 128,
+        flush_interval: float = 0.5,
+        max_queue_size: int = 10000,
+        overflow_policy: str = "drop_oldest",
+        max_batch_bytes: int = 3 * 1024 * 1024,
+        max_retries: int = 3,
+        retry_backoff: float = 0.2,
     ) -> None:
+        """
+        Args:
+            batch_size: 单次 PutLogs 请求携带的最大日志条数(不超过 4096)
+            flush_interval: 后台线程的最长发送间隔(秒)
+            max_queue_size: 待发送队列的最大长度
+            overflow_policy: 队列满时的策略，drop_oldest 丢弃最旧记录，block 阻塞等待
+            max_batch_bytes: 单次 PutLogs 请求的最大日志字节数(估算值，不超过 5MB)
+            max_retries: PutLogs 失败后的最大重试次数
+            retry_backoff: 首次重试前的等待时间(秒)，之后每次翻倍
+        """
+        if overflow_policy not in self._OVERFLOW_POLICIES:
+            raise ValueError(
+                f"overflow_policy must be one of {self._OVERFLOW_POLICIES}, "
+                f"got {overflow_policy!r}"
+            )
+
         super().__init__()
         self._client = client
         self._config = config
         self._LogItem = log_item_cls
         self._PutLogsRequest = put_logs_request_cls
         self._LogException = log_exception_cls
-        self._lock = threading.Lock()
         self._pack_id_generator = PackIdGenerator()
+        # Resolved once instead of per record / per log item
+        self._service_name = config.service_name
+        self._static_pairs: Tuple[Tuple[str, str], ...] = (
+            (("service", config.service_name),) if config.service_name else ()
+        )
+        self._include_extra_json = config.include_extra_json
+        self._supports_nano: Optional[bool] = None
+        # The SDK's set_contents deep-copies the pairs; ours are built per
+        # record and never shared, so assign them to the item directly
+        set_contents = getattr(log_item_cls, "set_contents", None)
+        self._assign_contents = (
+            getattr(set_contents, "__module__", None) == "aliyun.log.logitem"
+        )
+        self._int_strings: Dict[int, str] = {}
+
+        self._batch_size = min(max(1, batch_size), self._MAX_BATCH_SIZE)
+        self._flush_interval = flush_interval
+        self._max_queue_size = max(1, max_queue_size)
+        self._overflow_policy = overflow_policy
+        self._max_batch_bytes = min(max(1, max_batch_bytes), self._MAX_BATCH_BYTES)
+        self._max_retries = max(0, max_retries)
+        self._retry_backoff = retry_backoff
+        self._queue: Deque[_QueueEntry] = deque()
+        self._pending_bytes = 0
+        self._oldest_enqueued = 0.0
+        self._dropped = 0
+        self._dropped_reported = 0
+        self._condition = threading.Condition()
+        # Batches drained but not yet sent; flush() waits for these too
+        self._in_flight = 0
+        # Failed requests the dispatcher retries later: (due, attempt, request)
+        self._retries: List[Tuple[float, int, Any]] = []
+        self._registered = False
+        self._closed = False
+        # Cleared while a background logstore bootstrap is running
+        self._ready = threading.Event()
+        self._ready.set()
+        self._failed = False
 
     def emit(self, record: logging.LogRecord) -> None:
-        if not self._client:
+        # loguru calls handle() directly, bypassing the stdlib level check
+        if not self._client or record.levelno < self.level:
             return
 
         try:
+            seconds, nano_part = self._resolve_timestamp(record)
             contents = self._build_contents(record)
+            entry = (contents, seconds, nano_part, self._estimate_size(contents))
+        except Exception as exc:  # noqa: BLE001 - logging handlers must swallow errors
+            _module_logger.warning(
+                "Unexpected error while preparing log for SLS: %s", exc
+            )
+            return
 
-            log_item = self._LogItem()
-            seconds, nano_part = self._resolve_timestamp(record)
-            log_item.set_time(seconds)
-            if hasattr(log_item, "set_time_nano_part"):
-                log_item.set_time_nano_part(nano_part)
+        queued = wake = False
+        with self._condition:
+            if not self._closed and not self._registered:
+                _DISPATCHER.register(self)
+                self._registered = True
+            if self._overflow_policy == "block":
+                while len(self._queue) >= self._max_queue_size and not self._closed:
+                    _DISPATCHER.wake()
+                    self._condition.wait()
+            elif len(self._queue) >= self._max_queue_size:
+                self._pending_bytes -= self._queue.popleft()[3]
+                self._dropped += 1
+            if self._failed:
+                # Background bootstrap could not provide the logstore
+                return
+            if not self._closed:
+                if not self._queue:
+                    # Start of a new flush window: the dispatcher needs a deadline
+                    self._oldest_enqueued = time.monotonic()
+                    wake = True
+                self._queue.append(entry)
+                self._pending_bytes += entry[3]
+                wake = wake or self._batch_ready()
+                queued = True
+
+        if not queued:
+            # Handler already closed: deliver synchronously instead of queueing
+            self._send([entry])
+        elif wake:
+            _DISPATCHER.wake()
 
-            log_item.set_contents(self._to_content_pairs(contents))
+    @property
+    def dropped(self) -> int:
+        """Number of records discarded by the drop_oldest policy"""
+        with self._condition:
+            return self._dropped
+
+    def flush(self) -> None:
+        """Synchronously send every queued record"""
+        # Nothing can be sent before the logstore bootstrap has finished; a
+        # bootstrap stuck on the network must not hang close() or exit
+        if not self._ready.wait(self._BOOTSTRAP_WAIT):
+            with self._condition:
+                pending = len(self._queue)
+            _module_logger.warning(
+                "SLS logstore %s still being prepared, %d records not flushed",
+                self._config.logstore,
+                pending,
+            )
+            return
+        self._flush(blocking=True)
 
-            request = self._PutLogsRequest(
-                self._config.project,
+    def _flush(self, blocking: bool) -> None:
+        """
+        Send due retries and every queued batch
+
+        Blocking flushes sleep through retry backoffs and wait for batches in
+        flight on other threads; the shared dispatcher schedules retries
+        instead, so one failing endpoint cannot stall the other handlers.
+        """
+        # No lock is held while sending: the SDK client is thread-safe, so the
+        # dispatcher and other flushing threads may send batches concurrently
+        while True:
+            with self._condition:
+                now = time.monotonic()
+                due = [r for r in self._retries if blocking or r[0] <= now]
+                if due:
+                    self._retries = [r for r in self._retries if r not in due]
+            for _, attempt, request in due:
+                self._deliver_in_flight(request, attempt, blocking)
+
+            while True:
+                batch = self._drain()
+                if not batch:
+                    break
+                self._deliver_in_flight(self._build_request(batch), 0, blocking)
+
+            if not blocking:
+                break
+            with self._condition:
+                # Batches drained by another thread must also be delivered
+                while self._in_flight and not self._retries:
+                    self._condition.wait()
+                if not self._retries:
+                    break
+
+        with self._condition:
+            dropped = self._dropped
+            newly_dropped = dropped - self._dropped_reported
+            self._dropped_reported = dropped
+        if newly_dropped > 0:
+            _module_logger.warning(
+                "SLS queue full, dropped %d records (%d in total)",
+                newly_dropped,
+                dropped,
+            )
+
+    def close(self) -> None:
+        """Unregister from the dispatcher and send remaining records"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        _DISPATCHER.unregister(self)
+
+        self.flush()
+        super().close()
+
+    def _service(self, now: float) -> Optional[float]:
+        """
+        Called by the dispatcher: flush if a batch is ready or the oldest
+        record has waited flush_interval, otherwise return the seconds left
+        until that deadline (None when the queue is empty)
+        """
+        if not self._ready.is_set():
+            # The bootstrap wakes the dispatcher once the logstore is usable
+            return None
+        with self._condition:
+            delays = [due - now for due, _, _ in self._retries]
+            if self._queue:
+                delays.append(
+                    0
+                    if self._batch_ready()
+                    else self._oldest_enqueued + self._flush_interval - now
+                )
+            if not delays:
+                return None
+            if min(delays) > 0:
+                return min(delays)
+
+        self._flush(blocking=False)
+        with self._condition:
+            if not self._retries:
+                return None
+            return max(0.0, min(due for due, _, _ in self._retries) - time.monotonic())
+
+    def _start_bootstrap(self, client_wrapper: "SLSClient") -> None:
+        """Queue records while the logstore is checked on a daemon thread"""
+        self._ready.clear()
+        threading.Thread(
+            target=self._bootstrap,
+            args=(client_wrapper,),
+            name="ulogger-sls-bootstrap",
+            daemon=True,
+        ).start()
+
+    def _bootstrap(self, client_wrapper: "SLSClient") -> None:
+        try:
+            ok = client_wrapper.ensure_logstore_exists()
+        except Exception as exc:  # noqa: BLE001 - never kill the bootstrap thread
+            _module_logger.error("Unexpected error preparing SLS logstore: %s", exc)
+            ok = False
+
+        if not ok:
+            with self._condition:
+                discarded = len(self._queue)
+                self._failed = True
+                self._queue.clear()
+                self._pending_bytes = 0
+                self._condition.notify_all()
+            _module_logger.error(
+                "SLS logstore %s is unavailable, discarding %d queued records",
                 self._config.logstore,
-                logitems=[log_item],
+                discarded,
             )
 
-            pack_id = self._pack_id_generator.generate()
-            self._attach_pack_id(request, pack_id)
+        self._ready.set()
+        _DISPATCHER.wake()
 
-            with self._lock:
-                self._client.put_logs(request)
+    def _batch_ready(self) -> bool:
+        """Whether a full batch is queued (caller holds the condition)"""
+        return (
+            len(self._queue) >= min(self._batch_size, self._max_queue_size)
+            or self._pending_bytes >= self._max_batch_bytes
+        )
 
-        except self._LogException as exc:  # type: ignore[misc]
-            logging.getLogger(__name__).warning(
-                "Failed to put logs to SLS project=%s logstore=%s: %s",
+    def _drain(self) -> List[_QueueEntry]:
+        """Pop one batch (marking it in flight) and wake blocked producers"""
+        with self._condition:
+            batch: List[_QueueEntry] = []
+            batch_bytes = 0
+            while self._queue and len(batch) < self._batch_size:
+                entry_bytes = self._queue[0][3]
+                if batch and batch_bytes + entry_bytes > self._max_batch_bytes:
+                    break
+                batch.append(self._queue.popleft())
+                batch_bytes += entry_bytes
+            if batch:
+                self._pending_bytes -= batch_bytes
+                self._in_flight += 1
+                self._condition.notify_all()
+        return batch
+
+    def _send(self, batch: List[_QueueEntry]) -> None:
+        """Send a batch of entries as one PutLogs request"""
+        request = self._build_request(batch)
+        if request is not None:
+            self._deliver(request, 0, blocking=True)
+
+    def _build_request(self, batch: List[_QueueEntry]) -> Any:
+        """Build the PutLogs request for a batch (None if that fails)"""
+        try:
+            log_items = []
+            for contents, seconds, nano_part, _ in batch:
+                log_item = self._LogItem()
+                log_item.set_time(seconds)
+                if self._supports_nano is None:
+                    self._supports_nano = hasattr(log_item, "set_time_nano_part")
+                if self._supports_nano:
+                    log_item.set_time_nano_part(nano_part)
+                if self._assign_contents:
+                    log_item.contents = contents
+                else:
+                    log_item.set_contents(contents)
+                log_items.append(log_item)
+
+            request = self._PutLogsRequest(
                 self._config.project,
                 self._config.logstore,
-                exc,
+                logitems=log_items,
             )
+
+            # Retries reuse the same pack id so SLS can deduplicate them
+            pack_id = self._pack_id_generator.generate()
+            self._attach_pack_id(request, pack_id)
         except Exception as exc:  # noqa: BLE001 - logging handlers must swallow errors
-            logging.getLogger(__name__).warning(
-                "Unexpected error while sending log to SLS: %s", exc
+            _module_logger.warning(
+                "Unexpected error while building SLS request: %s", exc
             )
+            return None
+        return request
+
+    def _deliver_in_flight(self, request: Any, attempt: int, blocking: bool) -> None:
+        """Deliver a drained batch, then release it unless a retry holds it"""
+        scheduled = False
+        try:
+            if request is not None:
+                scheduled = self._deliver(request, attempt, blocking)
+        finally:
+            if not scheduled:
+                with self._condition:
+                    self._in_flight -= 1
+                    self._condition.notify_all()
+
+    def _deliver(self, request: Any, attempt: int, blocking: bool) -> bool:
+        """
+        Put a request, retrying with exponential backoff
+
+        Returns True when a non-blocking caller left the next attempt
+        scheduled for the dispatcher instead of sleeping.
+        """
+        while True:
+            try:
+                self._client.put_logs(request)
+                return False
+            except self._LogException as exc:  # type: ignore[misc]
+                message = "Failed to put logs to SLS project=%s logstore=%s: %s"
+                args = (self._config.project, self._config.logstore, exc)
+            except Exception as exc:  # noqa: BLE001 - logging handlers must swallow errors
+                message = "Unexpected error while sending log to SLS: %s"
+                args = (exc,)
+
+            if attempt >= self._max_retries:
+                _module_logger.warning(message, *args)
+                return False
+            delay = self._retry_backoff * (2**attempt)
+            attempt += 1
+            if not blocking:
+                with self._condition:
+                    self._retries.append((time.monotonic() + delay, attempt, request))
+                    self._condition.notify_all()
+                return True
+            time.sleep(delay)
+
+    def _reset_after_fork(self) -> None:
+        """Drop state inherited from the parent when forked (see _SLSDispatcher)"""
+        # Locks may have been held by parent threads that do not exist here,
+        # and pending records belong to the parent, which sends them itself
+        self._condition = threading.Condition()
+        self._queue.clear()
+        self._pending_bytes = 0
+        self._in_flight = 0
+        self._retries = []
+        self._registered = False
+        # A bootstrap thread still running in the parent never finishes here
+        self._ready = threading.Event()
+        self._ready.set()
+        # Sharing the parent's pack ids would let SLS deduplicate our batches
+        self._pack_id_generator = PackIdGenerator()
+
+    def _int_str(self, value: int) -> str:
+        """Stringify an id or line number, remembering the result"""
+        if len(self._int_strings) >= self._INT_STRINGS_MAX:
+            # Bounded so thread churn cannot grow it without limit
+            self._int_strings.clear()
+        text = self._int_strings[value] = str(value)
+        return text
 
-    def _build_contents(self, record: logging.LogRecord) -> Dict[str, str]:
-        contents: Dict[str, str] = {
-            "message": record.getMessage(),
-            "levelname": record.levelname,
-            "name": record.name,
-        }
+    @staticmethod
+    def _estimate_size(contents: List[Tuple[str, str]]) -> int:
+        """Approximate UTF-8 size of the contents, avoiding encodes for ASCII"""
+        size = 0
+        for key, value in contents:
+            size += len(key)
+            size += len(value) if value.isascii() else len(value.encode("utf-8"))
+        return size
+
+    def _build_contents(self, record: logging.LogRecord) -> List[Tuple[str, str]]:
+        """Project a record straight onto SLS content pairs"""
+        # Arg-less str messages (everything loguru forwards) need no formatting
+        message = record.msg
+        if record.args or type(message) is not str:
+            message = record.getMessage()
+        pairs: List[Tuple[str, str]] = [
+            ("message", message),
+            ("levelname", record.levelname),
+        ]
+        if record.name is not None:
+            pairs.append(("name", record.name))
 
         if record.module:
-            contents["module"] = record.module
+            pairs.append(("module", record.module))
         if record.funcName:
-            contents["funcName"] = record.funcName
+            pairs.append(("funcName", record.funcName))
         if record.pathname:
-            contents["pathname"] = record.pathname
+            pairs.append(("pathname", record.pathname))
+        # process/thread ids and line numbers repeat, so reuse their strings
+        int_strings = self._int_strings
         if record.process:
-            contents["process"] = str(record.process)
-        if getattr(record, "processName", None):
-            contents["processName"] = record.processName
+            process = record.process
+            pairs.append(
+                ("process", int_strings.get(process) or self._int_str(process))
+            )
+        if record.processName:
+            pairs.append(("processName", record.processName))
         if record.thread:
-            contents["thread"] = str(record.thread)
-        if getattr(record, "threadName", None):
-            contents["threadName"] = record.threadName
+            thread = record.thread
+            pairs.append(("thread", int_strings.get(thread) or self._int_str(thread)))
+        if record.threadName:
+            pairs.append(("threadName", record.threadName))
         if record.lineno:
-            contents["lineno"] = str(record.lineno)
+            lineno = record.lineno
+            pairs.append(("lineno", int_strings.get(lineno) or self._int_str(lineno)))
 
-        if self._config.service_name:
-            contents["service"] = self._config.service_name
+        pairs.extend(self._static_pairs)
+
+        # "name" is reserved even when empty; "extra" holds the JSON if enabled
+        taken = {key for key, _ in pairs}
+        taken.add("name")
+        if self._include_extra_json:
+            taken.add("extra")
 
         extras = getattr(record, "extra", None)
         extra_payload: Dict[str, str] = {}
@@ -322,59 +882,55 @@ class SLSPropagateHandler(logging.Handler):
             for key, value in extras.items():
                 serialized = self._serialize_value(value)
                 extra_payload[key] = serialized
-                if key not in contents:
-                    contents[key] = serialized
+                if key not in taken:
+                    pairs.append((key, serialized))
+                    taken.add(key)
 
-        if "tag" not in contents:
+        if "tag" not in taken:
             tag = getattr(record, "tag", None)
             if tag is not None:
                 serialized_tag = self._serialize_value(tag)
-                contents["tag"] = serialized_tag
+                pairs.append(("tag", serialized_tag))
                 extra_payload.setdefault("tag", serialized_tag)
 
-        if record.exc_info:
-            contents.setdefault("exc", self.formatException(record.exc_info))
+        if record.exc_info and "exc" not in taken:
+            formatter = self.formatter or _EXC_FORMATTER
+            pairs.append(("exc", formatter.formatException(record.exc_info)))
 
-        if self._config.service_name:
-            extra_payload.setdefault("service", self._config.service_name)
+        if self._service_name:
+            extra_payload.setdefault("service", self._service_name)
 
-        if extra_payload:
-            contents["extra"] = json.dumps(extra_payload, ensure_ascii=False)
+        if extra_payload and self._include_extra_json:
+            pairs.append(("extra", _json_dumps(extra_payload)))
 
-        contents.setdefault("path", record.pathname or "")
+        if "path" not in taken:
+            pairs.append(("path", record.pathname or ""))
 
-        return contents
+        return pairs
 
     @staticmethod
     def _serialize_value(value) -> str:
+        # Exact-type lookup covers the common scalars without an isinstance chain
+        if type(value) in _SCALAR_TYPES:
+            return str(value)
         if isinstance(value, str):
             return value
         if isinstance(value, (int, float, bool)):
             return str(value)
         try:
-            return json.dumps(value, ensure_ascii=False)
+            return _json_dumps(value)
         except (TypeError, ValueError):
             return repr(value)
 
-    @staticmethod
-    def _to_content_pairs(contents: Dict[str, str]) -> List[Tuple[str, str]]:
-        pairs: List[Tuple[str, str]] = []
-        for key, value in contents.items():
-            if value is not None:
-                pairs.append((key, str(value)))
-        return pairs
-
     @staticmethod
     def _resolve_timestamp(record: logging.LogRecord) -> Tuple[int, int]:
         created = getattr(record, "created", 0.0)
-        if created:
-            seconds = int(created)
-            nano_part = int((created - seconds) * 1_000_000_000)
-            if 0 <= nano_part < 1_000_000_000:
-                return seconds, nano_part
+        if created > 0:
+            # A float epoch only carries ~0.2us precision; divmod keeps the
+            # nanosecond part in range without a separate check
+            return divmod(int(created * 1e9), 1_000_000_000)
 
-        now_ns = time.time_ns()
-        return now_ns // 1_000_000_000, now_ns % 1_000_000_000
+        return divmod(time.time_ns(), 1_000_000_000)
 
     def _attach_pack_id(self, request, pack_id: str) -> None:
         tag_payload = [("__pack_id__", pack_id)]
@@ -399,28 +955,46 @@ class SLSPropagateHandler(logging.Handler):
     def create(cls, config: SLSConfig) -> Optional["SLSPropagateHandler"]:
         """Create SLS handler if configuration is valid"""
         if not config.is_valid():
+            _module_logger.warning(
+                "SLS handler not created, missing config fields: %s",
+                ", ".join(config.missing_fields()),
+            )
             return None
 
         try:
             from aliyun.log import LogItem, PutLogsRequest
-            from aliyun.log.logexception import LogException
+
+            LogException = _get_log_exception()
         except ImportError:
-            print(
-                "aliyun-log-python-sdk>=0.8.11 is required for SLS integration with nanosecond precision"
+            _module_logger.warning(
+                "aliyun-log-python-sdk>=0.8.11 is required for SLS integration "
+                "with nanosecond precision"
             )
             return None
 
+        mode = config.ensure_logstore
         try:
             client_wrapper = SLSClient(config)
-            if not client_wrapper.ensure_logstore_exists():
-                return None
+            if mode == "sync":
+                if not client_wrapper.ensure_logstore_exists():
+                    return None
 
             client = client_wrapper.client
             if not client:
                 return None
 
-            handler = cls(client, config, LogItem, PutLogsRequest, LogException)
+            handler = cls(
+                client,
+                config,
+                LogItem,
+                PutLogsRequest,
+                LogException,
+                batch_size=config.batch_size,
+                flush_interval=config.flush_interval,
+            )
+            if mode == "background":
+                handler._start_bootstrap(client_wrapper)
             return handler
         except Exception as exc:
-            print(f"Failed to create SLS handler: {exc}")
+            _module_logger.error("Failed to create SLS handler: %s", exc)
             return None
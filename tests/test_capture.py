@@ -4,10 +4,24 @@ Tests for output capture functionality
 
 import sys
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 
 from ulogger.capture import CaptureOutput, capture_output
-from ulogger import LoggerFactory
+from ulogger import LoggerBuilder, LoggerFactory
+
+
+class _StubLogger:
+    """Minimal logger recording the messages passed to info/error"""
+
+    def __init__(self):
+        self.info_calls = []
+        self.error_calls = []
+
+    def info(self, message, *args, **kwargs):
+        self.info_calls.append(message)
+
+    def error(self, message, *args, **kwargs):
+        self.error_calls.append(message)
 
 
 class TestCaptureOutput:
@@ -59,6 +73,24 @@ class TestCaptureOutput:
         assert "Standard output" in capture.stdout_content
         assert "Error output" in capture.stderr_content
 
+    def test_capture_direct_writes(self):
+        """Test capturing writes that bypass print"""
+        with CaptureOutput("test_capture") as capture:
+            written = sys.stdout.write("partial ")
+            sys.stdout.write("line\n")
+
+        assert written == len("partial ")
+        assert capture.stdout_content == "partial line\n"
+
+    def test_capture_rejects_non_str_writes(self):
+        """Test writing bytes raises TypeError like a regular text stream"""
+        with CaptureOutput("test_capture") as capture:
+            with pytest.raises(TypeError):
+                sys.stdout.write(b"raw bytes\n")
+            print("still captured")
+
+        assert capture.stdout_content == "still captured\n"
+
     def test_streams_restored_after_capture(self):
         """Test that original streams are restored after capture"""
         original_stdout = sys.stdout
@@ -108,26 +140,75 @@ class TestCaptureOutput:
         assert capture.stdout_content.strip() == ""
         assert capture.stderr_content.strip() == ""
 
+    def test_whitespace_only_not_logged(self):
+        """Test whitespace-only output does not produce log entries"""
+        stub_logger = _StubLogger()
+
+        with CaptureOutput("test_capture", stub_logger):
+            print("  \t ")
+            print("", file=sys.stderr)
+
+        assert stub_logger.info_calls == []
+        assert stub_logger.error_calls == []
+
+    def test_disabled_level_not_logged(self, tmp_path):
+        """Test stdout is captured but not logged when INFO is disabled"""
+        log_path = tmp_path / "capture.log"
+        logger = (
+            LoggerBuilder()
+            .with_tag("capture_level")
+            .with_level("ERROR")
+            .with_console(False)
+            .with_file(str(log_path), enqueue=False)
+            .build()
+        )
+
+        with CaptureOutput("capture_level", logger) as capture:
+            print("quiet output")
+            print("loud error", file=sys.stderr)
+
+        assert "quiet output" in capture.stdout_content
+        content = log_path.read_text()
+        assert "quiet output" not in content
+        assert "Captured stderr: loud error" in content
+
+    def test_flush_threshold_logs_in_chunks(self):
+        """Test output is logged in line-aligned chunks past the threshold"""
+        stub_logger = _StubLogger()
+
+        with CaptureOutput("chunked", stub_logger, flush_threshold=20) as capture:
+            for i in range(5):
+                print(f"chunk line {i}")
+            sys.stdout.write("partial")
+
+        assert len(stub_logger.info_calls) == 6
+        assert stub_logger.info_calls[0] == "Captured stdout: chunk line 0"
+        assert stub_logger.info_calls[-1] == "Captured stdout: partial"
+        assert capture.stdout_content == "partial"
+
+    @patch("ulogger.capture.LoggerFactory.create_basic_logger")
+    def test_default_logger_created_lazily(self, mock_create_logger):
+        """Test no logger is built for captures without output"""
+        with CaptureOutput("test_capture"):
+            pass
+
+        mock_create_logger.assert_not_called()
+
     @patch("ulogger.capture.LoggerFactory.create_basic_logger")
     def test_logging_captured_content(self, mock_create_logger):
         """Test that captured content is logged"""
-        mock_logger = MagicMock()
-        mock_create_logger.return_value = mock_logger
+        stub_logger = _StubLogger()
+        mock_create_logger.return_value = stub_logger
 
         with CaptureOutput("test_capture") as capture:  # noqa: F841
             print("Test stdout message")
             print("Test stderr message", file=sys.stderr)
 
-        # Verify logger was called with captured content
-        mock_logger.info.assert_called_once()
-        mock_logger.error.assert_called_once()
-
-        # Check the logged messages contain the captured content
-        info_call_args = mock_logger.info.call_args[0][0]
-        error_call_args = mock_logger.error.call_args[0][0]
-
-        assert "Test stdout message" in info_call_args
-        assert "Test stderr message" in error_call_args
+        # Verify logger was called once per stream with the captured content
+        assert len(stub_logger.info_calls) == 1
+        assert len(stub_logger.error_calls) == 1
+        assert "Test stdout message" in stub_logger.info_calls[0]
+        assert "Test stderr message" in stub_logger.error_calls[0]
 
 
 class TestCaptureOutputContextManager:
@@ -202,8 +283,16 @@ class TestCaptureOutputPerformance:
             for i in range(100):
                 print(f"Line {i}")
 
-        for i in range(100):
-            assert f"Line {i}" in capture.stdout_content
+        expected = {f"Line {i}" for i in range(100)}
+        assert expected <= set(capture.stdout_content.splitlines())
+
+    def test_many_small_outputs_bulk(self):
+        """Test capturing the same lines written in a single call"""
+        with capture_output("many_small_bulk") as capture:
+            sys.stdout.write("".join(f"Line {i}\n" for i in range(100)))
+
+        expected = {f"Line {i}" for i in range(100)}
+        assert expected <= set(capture.stdout_content.splitlines())
 
 
 if __name__ == "__main__":
@@ -2,13 +2,18 @@
 Tests for core logging functionality
 """
 
-from pathlib import Path
-import tempfile
+import io
+import logging
+import os
+import signal
+import threading
+import time
 import pytest
+from loguru import logger as loguru_logger
 from unittest.mock import patch
 
 from ulogger import LoggerFactory, LoggerBuilder, SessionLogger
-from ulogger.core import LoggerConfig
+from ulogger.core import _LEVEL_NO, LoggerConfig, QueuedSink, _level_enabled
 from ulogger.sls import SLSConfig
 
 
@@ -27,8 +32,128 @@ class TestLoggerConfig:
         assert config.sls_enabled is False
         assert config.sls_config is None
         assert config.extra == {}
+        assert config.queue_size == 10000
+        assert config.overflow_policy == "block"
         assert "time:YYYY-MM-DD HH:mm:ss.SSS" in config.format
 
+    def test_config_uses_slots(self):
+        """Test unknown attributes are rejected instead of silently ignored"""
+        config = LoggerConfig()
+
+        assert not hasattr(config, "__dict__")
+        with pytest.raises(AttributeError):
+            config.levle = "DEBUG"
+
+
+class BlockingStream(io.StringIO):
+    """StringIO whose first write blocks until released"""
+
+    def __init__(self):
+        super().__init__()
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def write(self, data):
+        self.entered.set()
+        self.release.wait(5)
+        return super().write(data)
+
+
+class TestQueuedSink:
+    """Test QueuedSink class"""
+
+    def test_stop_drains_pending_messages(self):
+        """Test stop writes every queued message to the stream"""
+        stream = io.StringIO()
+        sink = QueuedSink(stream)
+
+        sink.write("first\n")
+        sink.write("second\n")
+        sink.stop()
+
+        assert stream.getvalue() == "first\nsecond\n"
+
+    def test_complete_waits_for_pending_messages(self):
+        """Test complete returns only once queued messages are written"""
+        stream = BlockingStream()
+        sink = QueuedSink(stream)
+        sink.write("first\n")
+        assert stream.entered.wait(5)
+        sink.write("second\n")
+
+        completer = threading.Thread(target=sink.complete)
+        completer.start()
+        completer.join(0.05)
+        assert completer.is_alive()
+
+        stream.release.set()
+        completer.join(5)
+        assert not completer.is_alive()
+        assert stream.getvalue() == "first\nsecond\n"
+        sink.stop()
+
+    def _fill(self, overflow_policy):
+        stream = BlockingStream()
+        sink = QueuedSink(stream, queue_size=2, overflow_policy=overflow_policy)
+
+        # Stall the worker on the first message so the queue can fill up
+        sink.write("a")
+        assert stream.entered.wait(5)
+        for message in ("b", "c", "d"):
+            sink.write(message)
+
+        stream.release.set()
+        sink.stop()
+        return stream.getvalue()
+
+    def test_drop_new_policy(self):
+        """Test drop_new discards messages written while the queue is full"""
+        assert self._fill("drop_new") == "abc"
+
+    def test_drop_oldest_policy(self):
+        """Test drop_oldest evicts the oldest pending message"""
+        assert self._fill("drop_oldest") == "acd"
+
+    def test_invalid_overflow_policy(self):
+        """Test unknown overflow policies are rejected"""
+        with pytest.raises(ValueError):
+            QueuedSink(io.StringIO(), overflow_policy="unknown")
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+    def test_forked_child_gets_running_worker(self, tmp_path):
+        """Test a forked child drains its own queue instead of hanging"""
+        log_path = tmp_path / "fork.log"
+        sink = QueuedSink.open_file(str(log_path), queue_size=2)
+        sink.write("parent\n")
+
+        pid = os.fork()
+        if pid == 0:
+            # More writes than queue_size: blocks forever without a worker
+            for index in range(5):
+                sink.write(f"child {index}\n")
+            sink.stop()
+            os._exit(0)
+
+        # Poll so a hung child fails the test instead of hanging the run
+        deadline = time.monotonic() + 10
+        while True:
+            done, status = os.waitpid(pid, os.WNOHANG)
+            if done or time.monotonic() >= deadline:
+                break
+            time.sleep(0.01)
+        if not done:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        sink.stop()
+
+        assert done, "forked child hung writing to the queued sink"
+        assert os.waitstatus_to_exitcode(status) == 0
+        lines = log_path.read_text().splitlines()
+        assert lines.count("parent") == 1
+        assert [line for line in lines if line.startswith("child")] == [
+            f"child {index}" for index in range(5)
+        ]
+
 
 class TestLoggerBuilder:
     """Test LoggerBuilder class"""
@@ -64,6 +189,20 @@ class TestLoggerBuilder:
 
         assert builder._config.file_enabled is True
         assert builder._config.file_path == file_path
+        assert builder._config.file_enqueue is True
+
+        builder = LoggerBuilder().with_file(file_path, enqueue=False)
+        assert builder._config.file_enqueue is False
+
+    def test_with_queue(self):
+        """Test queue configuration"""
+        builder = LoggerBuilder().with_queue(100, "drop_oldest")
+
+        assert builder._config.queue_size == 100
+        assert builder._config.overflow_policy == "drop_oldest"
+
+        with pytest.raises(ValueError):
+            LoggerBuilder().with_queue(100, "bogus")
 
     def test_with_sls(self):
         """Test SLS configuration"""
@@ -87,130 +226,182 @@ class TestLoggerBuilder:
 class TestLoggerFactory:
     """Test LoggerFactory class"""
 
-    def test_create_basic_logger(self):
-        """Test basic logger creation"""
-        import tempfile
-        import time
-
-        logger = LoggerFactory.create_basic_logger("test")
+    @pytest.mark.parametrize(
+        "level,log_method,message",
+        [("INFO", "info", "Test message"), ("DEBUG", "debug", "Debug message")],
+    )
+    def test_create_basic_logger(self, tmp_path, level, log_method, message):
+        """Test basic logger creation and file output at the given level"""
+        logger = LoggerFactory.create_basic_logger("test", level)
         assert logger is not None
 
         # Test logging using file output
-        with tempfile.NamedTemporaryFile(mode="w+", delete=False) as temp_file:
-            temp_path = temp_file.name
-
-        try:
-            # Create a test logger that writes to file
-            test_logger = (
-                LoggerBuilder()
-                .with_tag("test")
-                .with_level("INFO")
-                .with_console(False)
-                .with_file(temp_path)
-                .build()
-            )
+        temp_path = str(tmp_path / "test.log")
 
-            test_logger.info("Test message")
-
-            # Give loguru time to write the file (it's async)
-            # In CI environments, we need more time
-            time.sleep(0.5)
+        # Create a test logger that writes to file
+        test_logger = (
+            LoggerBuilder()
+            .with_tag("test")
+            .with_level(level)
+            .with_console(False)
+            .with_file(temp_path, enqueue=False)
+            .build()
+        )
 
-            # Read the file content
-            with open(temp_path, "r") as f:
-                output = f.read()
+        getattr(test_logger, log_method)(message)
 
-            # Should contain the test message
-            assert "Test message" in output
+        with open(temp_path, "r") as f:
+            output = f.read()
 
-        finally:
-            # Clean up
-            Path(temp_path).unlink(missing_ok=True)
+        # Should contain the test message
+        assert message in output
 
-    def test_create_basic_logger_with_level(self):
-        """Test basic logger with custom level"""
-        import tempfile
-        import time
+    def test_create_logger_with_config(self):
+        """Test logger creation with custom configuration"""
+        config = LoggerConfig()
+        config.tag = "custom_test"
+        config.level = "WARNING"
+        config.console_enabled = False
 
-        logger = LoggerFactory.create_basic_logger("test", "DEBUG")
+        logger = LoggerFactory.create_logger(config)
         assert logger is not None
 
-        # Test logging using file output
-        with tempfile.NamedTemporaryFile(mode="w+", delete=False) as temp_file:
-            temp_path = temp_file.name
+    def test_create_basic_logger_cached(self):
+        """Test identical basic loggers are reused from the cache"""
+        first = LoggerFactory.create_basic_logger("cached", "INFO")
+        second = LoggerFactory.create_basic_logger("cached", "INFO")
+        other = LoggerFactory.create_basic_logger("cached", "DEBUG")
 
-        try:
-            # Create a test logger that writes to file
-            test_logger = (
-                LoggerBuilder()
-                .with_tag("test")
-                .with_level("DEBUG")
-                .with_console(False)
-                .with_file(temp_path)
-                .build()
-            )
+        assert first is second
+        assert other is not first
 
-            test_logger.debug("Debug message")
+    def test_create_basic_logger_restores_sinks(self):
+        """Test a cached basic logger still reinstates its sinks"""
+        first = LoggerFactory.create_basic_logger("restored")
+        handler_ids = list(LoggerFactory._handler_ids)
 
-            # Give loguru time to write the file (it's async)
-            # In CI environments, we need more time
-            time.sleep(0.5)
+        config = LoggerConfig()
+        config.console_enabled = False
+        LoggerFactory.create_logger(config)
+        assert LoggerFactory._handler_ids != handler_ids
 
-            # Read the file content
-            with open(temp_path, "r") as f:
-                output = f.read()
+        second = LoggerFactory.create_basic_logger("restored")
+        assert second is first
+        assert len(LoggerFactory._handler_ids) == 1
 
-            assert "Debug message" in output
+    def test_same_sinks_not_rebuilt_across_tags(self):
+        """Test loggers differing only by tag share the configured sinks"""
+        LoggerFactory.create_basic_logger("shared_a")
+        handler_ids = list(LoggerFactory._handler_ids)
 
-        finally:
-            # Clean up
-            Path(temp_path).unlink(missing_ok=True)
+        LoggerFactory.create_basic_logger("shared_b")
+        assert LoggerFactory._handler_ids == handler_ids
 
-    def test_create_logger_with_config(self):
-        """Test logger creation with custom configuration"""
-        config = LoggerConfig()
-        config.tag = "custom_test"
-        config.level = "WARNING"
-        config.console_enabled = False
+        LoggerFactory.create_basic_logger("shared_b", "DEBUG")
+        assert LoggerFactory._handler_ids != handler_ids
 
-        logger = LoggerFactory.create_logger(config)
-        assert logger is not None
+    def test_invalidate(self):
+        """Test invalidate drops cached loggers for a tag"""
+        first = LoggerFactory.create_basic_logger("invalidated")
+        LoggerFactory.invalidate("invalidated")
+        second = LoggerFactory.create_basic_logger("invalidated")
 
-    def test_create_logger_file_output(self):
-        """Test logger with file output"""
-        import time
+        assert first is not second
 
-        with tempfile.NamedTemporaryFile(mode="w", delete=False) as temp_file:
-            temp_path = temp_file.name
+    def test_create_logger_keeps_foreign_handlers(self):
+        """Test building a logger only replaces handlers owned by the factory"""
+        LoggerFactory.create_basic_logger("owner")
+        messages = []
+        handler_id = loguru_logger.add(messages.append, format="{message}")
 
         try:
             config = LoggerConfig()
-            config.tag = "file_test"
-            config.file_enabled = True
-            config.file_path = temp_path
+            config.tag = "other_owner"
             config.console_enabled = False
-
             logger = LoggerFactory.create_logger(config)
-            logger.info("File test message")
+            logger.info("Still delivered")
+        finally:
+            loguru_logger.remove(handler_id)
 
-            # Give loguru time to write the file (it's async)
-            # In CI environments, we need more time
-            time.sleep(0.5)
+        assert messages == ["Still delivered\n"]
 
-            # Read the file content
-            with open(temp_path, "r") as f:
-                content = f.read()
+    def test_create_logger_file_output(self, tmp_path):
+        """Test logger with file output"""
 
-            assert "File test message" in content
+        temp_path = str(tmp_path / "test.log")
 
-        finally:
-            # Clean up
-            Path(temp_path).unlink(missing_ok=True)
+        config = LoggerConfig()
+        config.tag = "file_test"
+        config.file_enabled = True
+        config.file_path = temp_path
+        config.console_enabled = False
+
+        logger = LoggerFactory.create_logger(config)
+        logger.info("File test message")
+
+        # Removing the sinks stops the queued file sink, draining it first
+        LoggerFactory.shutdown()
+        with open(temp_path, "r") as f:
+            content = f.read()
+
+        assert "File test message" in content
+
+    @pytest.mark.parametrize("enqueue", [True, False])
+    def test_file_path_template_expanded(self, tmp_path, enqueue):
+        """Test loguru placeholders in the file path are expanded"""
+        config = LoggerConfig()
+        config.tag = "template_test"
+        config.file_enabled = True
+        config.file_path = str(tmp_path / "app_{time:YYYY}.log")
+        config.file_enqueue = enqueue
+        config.console_enabled = False
+
+        logger = LoggerFactory.create_logger(config)
+        logger.info("Templated path message")
+        LoggerFactory.shutdown()
+
+        log_files = list(tmp_path.iterdir())
+        assert [path.name for path in log_files] == [f"app_{time.strftime('%Y')}.log"]
+        assert "Templated path message" in log_files[0].read_text()
+
+    def test_failed_sinks_rolled_back(self, tmp_path):
+        """Test a build that fails part-way leaves no handlers or sink key"""
+        blocker = tmp_path / "not_a_directory"
+        blocker.write_text("")
+        handlers_before = len(loguru_logger._core.handlers)
+
+        bad_file = LoggerConfig()
+        bad_file.file_enabled = True
+        bad_file.file_path = str(blocker / "app.log")
+        bad_policy = LoggerConfig()
+        bad_policy.overflow_policy = "bogus"
+
+        for config, error in ((bad_file, OSError), (bad_policy, ValueError)):
+            with pytest.raises(error):
+                LoggerFactory.create_logger(config)
+            assert LoggerFactory._sink_key is None
+            assert LoggerFactory._handler_ids == []
+            assert len(loguru_logger._core.handlers) <= handlers_before
+
+    @patch("ulogger.sls.SLSPropagateHandler.create", return_value=None)
+    def test_failed_sls_handler_retried(self, mock_sls_handler):
+        """Test a failed SLS setup is attempted again by the next build"""
+        config = LoggerConfig()
+        config.console_enabled = False
+        config.sls_enabled = True
+        config.sls_config = SLSConfig(
+            endpoint="test.endpoint", project="test_project", logstore="test_logstore"
+        )
+
+        LoggerFactory.create_logger(config)
+        LoggerFactory.create_logger(config)
+
+        assert mock_sls_handler.call_count == 2
+        assert LoggerFactory._sink_key is None
 
     @patch("ulogger.sls.SLSPropagateHandler.create")
     def test_create_logger_with_sls(self, mock_sls_handler):
         """Test logger creation with SLS handler"""
-        import logging
 
         # Create a proper mock handler that inherits from logging.Handler
         class MockSLSHandler(logging.Handler):
@@ -259,89 +450,82 @@ class TestLoggerFactory:
 class TestLoggerBuilderIntegration:
     """Integration tests for LoggerBuilder"""
 
-    def test_logger_builder_full_workflow(self):
+    def test_logger_builder_full_workflow(self, tmp_path):
         """Test complete logger builder workflow"""
-        import time
-
-        with tempfile.NamedTemporaryFile(mode="w", delete=False) as temp_file:
-            temp_path = temp_file.name
-
-        try:
-            logger = (
-                LoggerBuilder()
-                .with_tag("integration_test")
-                .with_level("DEBUG")
-                .with_console(False)
-                .with_file(temp_path)
-                .with_extra(component="test", version="1.0")
-                .build()
-            )
-
-            logger.debug("Debug message")
-            logger.info("Info message")
-            logger.warning("Warning message")
-
-            # Give loguru time to write the file (it's async)
-            # In CI environments, we need more time
-            time.sleep(0.5)
-
-            # Read the file content
-            with open(temp_path, "r") as f:
-                content = f.read()
-
-            assert "Debug message" in content
-            assert "Info message" in content
-            assert "Warning message" in content
-
-        finally:
-            # Clean up
-            Path(temp_path).unlink(missing_ok=True)
 
+        temp_path = str(tmp_path / "test.log")
 
-def test_session_logger():
-    """Test session-based logging"""
-    import tempfile
-    import time
-
-    session_logger = SessionLogger.create("test_session", "session_123")
-
-    with tempfile.NamedTemporaryFile(mode="w+", delete=False) as temp_file:
-        temp_path = temp_file.name
-
-    try:
-        # Create a logger that writes to file for testing
-        test_logger = (
+        logger = (
             LoggerBuilder()
-            .with_tag("test_session")
+            .with_tag("integration_test")
             .with_level("DEBUG")
             .with_console(False)
-            .with_file(temp_path)
+            .with_file(temp_path, enqueue=False)
+            .with_extra(component="test", version="1.0")
             .build()
         )
 
-        # Replace the session logger's logger
-        session_logger.logger = test_logger
+        logger.debug("Debug message")
+        logger.info("Info message")
+        logger.warning("Warning message")
 
-        session_logger.info("user_login", "User logged in successfully", user_id=12345)
-        session_logger.error("auth_failed", "Invalid credentials", attempts=3)
+        with open(temp_path, "r") as f:
+            content = f.read()
 
-        # Give loguru time to write the file (it's async)
-        # In CI environments, we need more time
-        time.sleep(0.5)
+        assert "Debug message" in content
+        assert "Info message" in content
+        assert "Warning message" in content
 
-        # Read the file content
-        with open(temp_path, "r") as f:
-            output = f.read()
 
-        assert "session=session_123" in output
-        assert 'event="user_login"' in output
-        assert 'content="User logged in successfully"' in output
-        assert "user_id=12345" in output
-        assert 'event="auth_failed"' in output
+def test_session_logger(tmp_path):
+    """Test session-based logging"""
+    session_logger = SessionLogger.create("test_session", "session_123")
 
-    finally:
-        # Clean up
-        Path(temp_path).unlink(missing_ok=True)
+    temp_path = str(tmp_path / "test.log")
+
+    # Create a logger that writes to file for testing
+    test_logger = (
+        LoggerBuilder()
+        .with_tag("test_session")
+        .with_level("DEBUG")
+        .with_console(False)
+        .with_file(temp_path, enqueue=False)
+        .build()
+    )
+
+    # Replace the session logger's logger
+    session_logger.logger = test_logger
+
+    session_logger.info("user_login", "User logged in successfully", user_id=12345)
+    session_logger.error("auth_failed", "Invalid credentials", attempts=3)
+
+    with open(temp_path, "r") as f:
+        output = f.read()
+
+    assert "session=session_123" in output
+    assert 'event="user_login"' in output
+    assert 'content="User logged in successfully"' in output
+    assert "user_id=12345" in output
+    assert 'event="auth_failed"' in output
+
+
+def test_level_enabled_gate():
+    """Test the shared level gate and its fallbacks"""
+    logger = (
+        LoggerBuilder()
+        .with_tag("gate")
+        .with_level("WARNING")
+        .with_console(False)
+        .with_file(os.devnull, enqueue=False)
+        .build()
+    )
+
+    assert not _level_enabled(logger, _LEVEL_NO["INFO"])
+    assert _level_enabled(logger, _LEVEL_NO["ERROR"])
+    # Not a loguru logger, or loguru without min_level: never filter
+    assert _level_enabled(logging.getLogger("gate"), _LEVEL_NO["DEBUG"])
+    with patch("ulogger.core._HAS_MIN_LEVEL", False):
+        assert _level_enabled(logger, _LEVEL_NO["DEBUG"])
 
 
 if __name__ == "__main__":
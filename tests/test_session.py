@@ -2,11 +2,25 @@
 Tests for session-based logging functionality
 """
 
+import io
+import re
 import pytest
+from loguru import logger as loguru_logger
+from unittest.mock import MagicMock, patch
 
 from ulogger.session import SessionLogger
-from ulogger import LoggerFactory
-from pathlib import Path
+from ulogger import LoggerBuilder, LoggerFactory
+
+_SESSION_EVENT = re.compile(r'session=(\S+) event="([^"]+)"')
+
+
+def _session_events(output: str) -> set:
+    """Collect the (session, event) pair of every logged line"""
+    return {
+        match.groups()
+        for match in map(_SESSION_EVENT.search, output.splitlines())
+        if match
+    }
 
 
 class TestSessionLogger:
@@ -81,168 +95,157 @@ class TestSessionLogger:
         assert "float_val=3.14" in message
         assert "bool_val=True" in message
 
+    def test_format_message_exact_output(self):
+        """Test exact message layout with mixed value types"""
+        session_logger = SessionLogger("test", "sess_123")
+        message = session_logger._format_message(
+            "order", "Created", order_id="A1", total=9.5, items=[1, 2]
+        )
 
-class TestSessionLoggerMethods:
-    """Test SessionLogger logging methods"""
+        assert message == (
+            'session=sess_123 event="order" content="Created" '
+            'order_id="A1" total=9.5 items=[1, 2]'
+        )
 
-    def setup_method(self):
-        """Setup for each test method"""
-        self.session_logger = SessionLogger.create("test_session", "session_123")
+    def test_format_message_str_subclass_quoted(self):
+        """Test str subclasses are quoted like plain strings"""
 
-    def capture_log_output(self, log_method, *args, **kwargs):
-        """Helper method to capture log output"""
-        import tempfile
-        import time
+        class Name(str):
+            pass
 
-        with tempfile.NamedTemporaryFile(mode="w+", delete=False) as temp_file:
-            temp_path = temp_file.name
+        session_logger = SessionLogger("test", "sess_123")
+        message = session_logger._format_message("event", name=Name("alice"))
 
-        try:
-            # Create a logger that writes to file for testing
-            from ulogger import LoggerBuilder
-
-            test_logger = (
-                LoggerBuilder()
-                .with_tag("test_session")
-                .with_level("DEBUG")
-                .with_console(False)
-                .with_file(temp_path)
-                .build()
-            )
-
-            # Replace the session logger's logger with our test logger
-            original_logger = self.session_logger.logger
-            self.session_logger.logger = test_logger
-
-            # Call the log method
-            log_method(*args, **kwargs)
-
-            # Restore original logger
-            self.session_logger.logger = original_logger
-
-            # Give loguru time to write the file (it's async)
-            # In CI environments, we need more time
-            time.sleep(0.5)
-
-            # Read the file content
-            with open(temp_path, "r") as f:
-                content = f.read()
-
-            return content
-
-        finally:
-            # Clean up
-            Path(temp_path).unlink(missing_ok=True)
-
-    def test_info_logging(self):
-        """Test info level logging"""
-        output = self.capture_log_output(
-            self.session_logger.info,
-            "user_login",
-            "User logged in successfully",
-            user_id=12345,
-        )
+        assert message.endswith('name="alice"')
 
-        assert "session=session_123" in output
-        assert 'event="user_login"' in output
-        assert 'content="User logged in successfully"' in output
-        assert "user_id=12345" in output
-        assert "INFO" in output
-
-    def test_debug_logging(self):
-        """Test debug level logging"""
-        # Create logger with DEBUG level
-        debug_session = SessionLogger("debug_test", "debug_session")
-        debug_session.logger = LoggerFactory.create_basic_logger("debug", "DEBUG")
-
-        output = self.capture_log_output(
-            debug_session.debug, "debug_event", "Debug information"
-        )
+    def test_format_message_braces_kept_verbatim(self):
+        """Test braces in keys and values are not treated as format fields"""
+        session_logger = SessionLogger("test", "sess_123")
+        result = session_logger._format_message("event", **{"a{0}": "{b}"}, n=1)
 
-        assert "session=debug_session" in output
-        assert 'event="debug_event"' in output
-        assert "DEBUG" in output
-
-    def test_warning_logging(self):
-        """Test warning level logging"""
-        output = self.capture_log_output(
-            self.session_logger.warning,
-            "performance_warning",
-            "Slow response time",
-            response_time=2.5,
-        )
+        assert result == 'session=sess_123 event="event" a{0}="{b}" n=1'
 
-        assert "session=session_123" in output
-        assert 'event="performance_warning"' in output
-        assert "response_time=2.5" in output
-        assert "WARNING" in output
-
-    def test_error_logging(self):
-        """Test error level logging"""
-        output = self.capture_log_output(
-            self.session_logger.error, "auth_failed", "Invalid credentials", attempts=3
-        )
+    def test_session_id_update_refreshes_prefix(self):
+        """Test changing session_id is reflected in later messages"""
+        session_logger = SessionLogger("test", "sess_123")
+        session_logger.session_id = "sess_456"
 
-        assert "session=session_123" in output
-        assert 'event="auth_failed"' in output
-        assert "attempts=3" in output
-        assert "ERROR" in output
-
-    def test_success_logging(self):
-        """Test success level logging"""
-        output = self.capture_log_output(
-            self.session_logger.success,
-            "payment_completed",
-            "Payment processed",
-            amount=100.00,
+        assert session_logger._format_message("event") == (
+            'session=sess_456 event="event"'
         )
 
-        assert "session=session_123" in output
-        assert 'event="payment_completed"' in output
-        assert "amount=100.0" in output
-        assert "SUCCESS" in output
-
-    def test_critical_logging(self):
-        """Test critical level logging"""
-        output = self.capture_log_output(
-            self.session_logger.critical, "system_failure", "Database connection lost"
-        )
 
+class TestSessionLoggerMethods:
+    """Test SessionLogger logging methods"""
+
+    @pytest.fixture(autouse=True, scope="class")
+    @classmethod
+    def _session_logger(cls):
+        """Share one session logger; these tests never mutate it"""
+        cls.session_logger = SessionLogger.create("test_session", "session_123")
+
+    @pytest.fixture
+    def log_output(self):
+        """Collect every record logged during the test in memory"""
+        buffer = io.StringIO()
+        sink_id = loguru_logger.add(buffer, level="DEBUG", format="{level} | {message}")
+        yield buffer
+        loguru_logger.remove(sink_id)
+
+    @pytest.mark.parametrize(
+        "method_name,event,content,kwargs,expected",
+        [
+            (
+                "info",
+                "user_login",
+                "User logged in successfully",
+                {"user_id": 12345},
+                "user_id=12345",
+            ),
+            ("debug", "debug_event", "Debug information", {}, None),
+            (
+                "warning",
+                "performance_warning",
+                "Slow response time",
+                {"response_time": 2.5},
+                "response_time=2.5",
+            ),
+            (
+                "error",
+                "auth_failed",
+                "Invalid credentials",
+                {"attempts": 3},
+                "attempts=3",
+            ),
+            (
+                "success",
+                "payment_completed",
+                "Payment processed",
+                {"amount": 100.00},
+                "amount=100.0",
+            ),
+            ("critical", "system_failure", "Database connection lost", {}, None),
+        ],
+    )
+    def test_level_logging(
+        self, log_output, method_name, event, content, kwargs, expected
+    ):
+        """Test each level method logs the structured message at its level"""
+        getattr(self.session_logger, method_name)(event, content, **kwargs)
+        output = log_output.getvalue()
+
+        assert output.startswith(f"{method_name.upper()} | ")
         assert "session=session_123" in output
-        assert 'event="system_failure"' in output
-        assert "CRITICAL" in output
+        assert f'event="{event}"' in output
+        assert f'content="{content}"' in output
+        if expected is not None:
+            assert expected in output
 
-    def test_exception_logging(self):
+    def test_exception_logging(self, log_output):
         """Test exception logging"""
         try:
             raise ValueError("Test exception")
         except ValueError:
-            output = self.capture_log_output(
-                self.session_logger.exception, "exception_occurred", "An error occurred"
-            )
+            self.session_logger.exception("exception_occurred", "An error occurred")
+            output = log_output.getvalue()
 
             assert "session=session_123" in output
             assert 'event="exception_occurred"' in output
             assert "ERROR" in output  # Exception logging uses ERROR level
 
-    def test_logging_without_content(self):
+    def test_logging_without_content(self, log_output):
         """Test logging without content parameter"""
-        output = self.capture_log_output(self.session_logger.info, "simple_event")
+        self.session_logger.info("simple_event")
+        output = log_output.getvalue()
 
         assert "session=session_123" in output
         assert 'event="simple_event"' in output
         assert "content=" not in output  # No content should be included
 
-    def test_logging_with_empty_content(self):
+    def test_logging_with_empty_content(self, log_output):
         """Test logging with empty content"""
-        output = self.capture_log_output(
-            self.session_logger.info, "empty_content_event", ""
-        )
+        self.session_logger.info("empty_content_event", "")
+        output = log_output.getvalue()
 
         assert "session=session_123" in output
         assert 'event="empty_content_event"' in output
         assert "content=" not in output  # Empty content should not be included
 
+    def test_disabled_level_skips_formatting(self):
+        """Test messages below the enabled level are not formatted"""
+        session_logger = SessionLogger(
+            "gate", "session_123", LoggerFactory.create_basic_logger("gate", "WARNING")
+        )
+
+        with patch.object(session_logger, "_format_message") as mock_format:
+            session_logger.debug("debug_event", "Hidden")
+            session_logger.info("info_event", "Hidden")
+            mock_format.assert_not_called()
+
+            mock_format.return_value = "visible"
+            session_logger.error("error_event", "Visible")
+            mock_format.assert_called_once()
+
 
 class TestSessionLoggerContext:
     """Test SessionLogger context management"""
@@ -255,6 +258,28 @@ class TestSessionLoggerContext:
         # Should return the same instance (modified in-place)
         assert bound_logger == session_logger
 
+    def test_logger_assignment_refreshes_opt_logger(self):
+        """Test log calls go to the most recently assigned logger"""
+        session_logger = SessionLogger.create("test", "session_123")
+        replacement = MagicMock(spec=["opt", "bind"])
+
+        session_logger.logger = replacement
+        session_logger.info("event")
+
+        replacement.opt.assert_called_once_with(depth=2)
+        replacement.opt.return_value.info.assert_called_once_with(
+            'session=session_123 event="event"'
+        )
+
+    def test_bind_refreshes_opt_logger(self):
+        """Test bind() rebuilds the cached opt logger"""
+        session_logger = SessionLogger.create("test", "session_123")
+        cached = session_logger._opt_logger
+
+        session_logger.bind(component="auth")
+
+        assert session_logger._opt_logger is not cached
+
     def test_with_context_method(self):
         """Test with_context method"""
         original_session = SessionLogger.create("test", "session_123")
@@ -272,140 +297,106 @@ class TestSessionLoggerContext:
 class TestSessionLoggerIntegration:
     """Integration tests for SessionLogger"""
 
-    def test_real_world_logging_scenario(self):
+    def test_real_world_logging_scenario(self, tmp_path):
         """Test a real-world logging scenario"""
-        import tempfile
-        import time
-        from pathlib import Path
-
         session_logger = SessionLogger.create("web_app", "user_session_789")
 
-        with tempfile.NamedTemporaryFile(mode="w+", delete=False) as temp_file:
-            temp_path = temp_file.name
+        temp_path = str(tmp_path / "test.log")
 
-        try:
-            # Create a logger that writes to file for testing
-            from ulogger import LoggerBuilder
-
-            test_logger = (
-                LoggerBuilder()
-                .with_tag("web_app")
-                .with_level("DEBUG")
-                .with_console(False)
-                .with_file(temp_path)
-                .build()
-            )
-
-            # Replace the session logger's logger
-            session_logger.logger = test_logger
-
-            # Simulate a user session flow
-            session_logger.info(
-                "session_start", "User session initiated", user_id="user_123"
-            )
-            session_logger.info(
-                "page_view", "Homepage viewed", page="/home", load_time=0.25
-            )
-            session_logger.warning(
-                "slow_query",
-                "Database query took longer than expected",
-                query_time=1.5,
-                table="users",
-            )
-            session_logger.success(
-                "login",
-                "User successfully logged in",
-                user_id="user_123",
-                method="oauth",
-            )
-            session_logger.error(
-                "payment_failed",
-                "Payment processing failed",
-                amount=99.99,
-                error_code="CARD_DECLINED",
-            )
-            session_logger.info("session_end", "User session ended", duration=1800)
-
-            # Give loguru time to write the file (it's async)
-            # In CI environments, we need more time
-            time.sleep(0.5)
-
-            # Read the file content
-            with open(temp_path, "r") as f:
-                output = f.read()
-
-            # Verify all events are logged with correct session ID
-            events = [
-                "session_start",
-                "page_view",
-                "slow_query",
-                "login",
-                "payment_failed",
-                "session_end",
-            ]
-            for event in events:
-                assert f'event="{event}"' in output
-                assert "session=user_session_789" in output
-
-            # Verify specific details
-            assert 'user_id="user_123"' in output
-            assert "load_time=0.25" in output
-            assert "query_time=1.5" in output
-            assert "amount=99.99" in output
-            assert "duration=1800" in output
-
-        finally:
-            # Clean up
-            Path(temp_path).unlink(missing_ok=True)
-
-    def test_multiple_session_loggers(self):
-        """Test multiple session loggers don't interfere"""
-        import tempfile
-        import time
-        from pathlib import Path
+        # Create a logger that writes to file for testing
+        test_logger = (
+            LoggerBuilder()
+            .with_tag("web_app")
+            .with_level("DEBUG")
+            .with_console(False)
+            .with_file(temp_path, enqueue=False)
+            .build()
+        )
+
+        # Replace the session logger's logger
+        session_logger.logger = test_logger
 
+        # Simulate a user session flow
+        session_logger.info(
+            "session_start", "User session initiated", user_id="user_123"
+        )
+        session_logger.info(
+            "page_view", "Homepage viewed", page="/home", load_time=0.25
+        )
+        session_logger.warning(
+            "slow_query",
+            "Database query took longer than expected",
+            query_time=1.5,
+            table="users",
+        )
+        session_logger.success(
+            "login",
+            "User successfully logged in",
+            user_id="user_123",
+            method="oauth",
+        )
+        session_logger.error(
+            "payment_failed",
+            "Payment processing failed",
+            amount=99.99,
+            error_code="CARD_DECLINED",
+        )
+        session_logger.info("session_end", "User session ended", duration=1800)
+
+        with open(temp_path, "r") as f:
+            output = f.read()
+
+        # Verify all events are logged with correct session ID
+        events = [
+            "session_start",
+            "page_view",
+            "slow_query",
+            "login",
+            "payment_failed",
+            "session_end",
+        ]
+        found = _session_events(output)
+        for event in events:
+            assert ("user_session_789", event) in found
+
+        # Verify specific details
+        assert 'user_id="user_123"' in output
+        assert "load_time=0.25" in output
+        assert "query_time=1.5" in output
+        assert "amount=99.99" in output
+        assert "duration=1800" in output
+
+    def test_multiple_session_loggers(self, tmp_path):
+        """Test multiple session loggers don't interfere"""
         session1 = SessionLogger.create("app1", "session_001")
         session2 = SessionLogger.create("app2", "session_002")
 
-        with tempfile.NamedTemporaryFile(mode="w+", delete=False) as temp_file:
-            temp_path = temp_file.name
+        temp_path = str(tmp_path / "test.log")
 
-        try:
-            # Create a shared logger that writes to file for testing
-            from ulogger import LoggerBuilder
-
-            test_logger = (
-                LoggerBuilder()
-                .with_tag("multi_session")
-                .with_level("DEBUG")
-                .with_console(False)
-                .with_file(temp_path)
-                .build()
-            )
-
-            # Replace both session loggers' logger
-            session1.logger = test_logger
-            session2.logger = test_logger
-
-            session1.info("event1", "First session event")
-            session2.info("event2", "Second session event")
-
-            # Give loguru time to write the file (it's async)
-            # In CI environments, we need more time
-            time.sleep(0.5)
-
-            # Read the file content
-            with open(temp_path, "r") as f:
-                output = f.read()
-
-            assert "session=session_001" in output
-            assert "session=session_002" in output
-            assert 'event="event1"' in output
-            assert 'event="event2"' in output
-
-        finally:
-            # Clean up
-            Path(temp_path).unlink(missing_ok=True)
+        # Create a shared logger that writes to file for testing
+        test_logger = (
+            LoggerBuilder()
+            .with_tag("multi_session")
+            .with_level("DEBUG")
+            .with_console(False)
+            .with_file(temp_path, enqueue=False)
+            .build()
+        )
+
+        # Replace both session loggers' logger
+        session1.logger = test_logger
+        session2.logger = test_logger
+
+        session1.info("event1", "First session event")
+        session2.info("event2", "Second session event")
+
+        with open(temp_path, "r") as f:
+            output = f.read()
+
+        assert _session_events(output) == {
+            ("session_001", "event1"),
+            ("session_002", "event2"),
+        }
 
 
 if __name__ == "__main__":
@@ -2,14 +2,25 @@
 Tests for SLS (Simple Log Service) functionality
 """
 
+import json
 import logging
+import os
+import sys
+import threading
+import time
+from dataclasses import replace
 from unittest.mock import MagicMock, patch
 
 import pytest
+from aliyun.log import LogClient, LogItem
 
 from ulogger.sls import PackIdGenerator, SLSClient, SLSConfig, SLSPropagateHandler
 
 
+class MockLogException(Exception):
+    """Stand-in for the SDK LogException, matched by message like the real one"""
+
+
 class TestPackIdGenerator:
     """Test PackIdGenerator behavior"""
 
@@ -29,6 +40,22 @@ class TestPackIdGenerator:
         assert prefix1 == prefix2
         assert int(seq2, 16) == int(seq1, 16) + 1
 
+    def test_generate_unique_across_threads(self):
+        generator = PackIdGenerator(prefix="abc")
+        results = []
+
+        def worker():
+            results.extend(generator.generate() for _ in range(1000))
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(set(results)) == 4000
+        assert all(pack_id.startswith("ABC-") for pack_id in results)
+
 
 class TestSLSConfig:
     """Test SLSConfig class"""
@@ -43,6 +70,7 @@ class TestSLSConfig:
         assert config.project == ""
         assert config.logstore == ""
         assert config.service_name == ""
+        assert config.include_extra_json is True
 
     def test_config_with_values(self):
         """Test SLS configuration with values"""
@@ -62,66 +90,112 @@ class TestSLSConfig:
         assert config.logstore == "test_logstore"
         assert config.service_name == "test_service"
 
-    def test_is_valid_complete_config(self):
-        """Test is_valid with complete configuration"""
-        config = SLSConfig(
+    @pytest.mark.parametrize(
+        "missing,expected",
+        [
+            ((), True),
+            (("endpoint",), False),
+            (("access_key_id",), False),
+            (("access_key_secret",), False),
+            (("project",), False),
+            (("logstore",), False),
+            (
+                (
+                    "endpoint",
+                    "access_key_id",
+                    "access_key_secret",
+                    "project",
+                    "logstore",
+                ),
+                False,
+            ),
+        ],
+    )
+    def test_is_valid(self, missing, expected):
+        """Test is_valid requires every connection field"""
+        fields = dict(
             endpoint="https://test.log.aliyuncs.com",
             access_key_id="test_key",
             access_key_secret="test_secret",
             project="test_project",
             logstore="test_logstore",
         )
+        for name in missing:
+            del fields[name]
 
-        assert config.is_valid() is True
+        assert SLSConfig(**fields).is_valid() is expected
 
-    def test_is_valid_incomplete_config(self):
-        """Test is_valid with incomplete configuration"""
-        # Missing endpoint
+    def test_is_valid_recomputed_after_change(self):
+        """Test memoized is_valid follows field updates"""
         config = SLSConfig(
+            endpoint="https://test.log.aliyuncs.com",
             access_key_id="test_key",
             access_key_secret="test_secret",
             project="test_project",
-            logstore="test_logstore",
         )
         assert config.is_valid() is False
 
-        # Missing project
-        config = SLSConfig(
-            endpoint="https://test.log.aliyuncs.com",
-            access_key_id="test_key",
-            access_key_secret="test_secret",
-            logstore="test_logstore",
-        )
-        assert config.is_valid() is False
+        config.logstore = "test_logstore"
+        assert config.is_valid() is True
 
-        # Missing logstore
-        config = SLSConfig(
-            endpoint="https://test.log.aliyuncs.com",
-            access_key_id="test_key",
-            access_key_secret="test_secret",
-            project="test_project",
-        )
+        config.endpoint = ""
         assert config.is_valid() is False
 
-    def test_is_valid_empty_config(self):
-        """Test is_valid with empty configuration"""
-        config = SLSConfig()
-        assert config.is_valid() is False
+    def test_is_valid_not_part_of_equality(self):
+        """Test the memoized result does not affect comparisons"""
+        first = SLSConfig(endpoint="a")
+        second = SLSConfig(endpoint="a")
+        first.is_valid()
+
+        assert first == second
+
+    def test_invalid_ensure_logstore_mode(self):
+        """Test unknown ensure_logstore modes are rejected"""
+        with pytest.raises(ValueError):
+            SLSConfig(ensure_logstore="lazy")
+
+        config = SLSConfig(ensure_logstore="skip")
+        with pytest.raises(ValueError):
+            config.ensure_logstore = "Sync"
+        assert config.ensure_logstore == "skip"
 
 
 class TestSLSClient:
     """Test SLSClient class"""
 
-    def setup_method(self):
-        """Setup for each test method"""
-        self.config = SLSConfig(
+    @pytest.fixture(autouse=True, scope="class")
+    @classmethod
+    def _config(cls):
+        """Share one config; tests derive variants with replace()"""
+        cls.config = SLSConfig(
             endpoint="https://test.log.aliyuncs.com",
             access_key_id="test_key",
             access_key_secret="test_secret",
             project="test_project",
             logstore="test_logstore",
         )
+
+    def setup_method(self):
+        """Setup for each test method"""
+        # Tests replace client methods with mocks, so the client is per test
         self.client = SLSClient(self.config)
+        SLSClient._ensured.clear()
+
+    @pytest.fixture
+    def mock_client_instance(self):
+        """SDK client the lazily built SLSClient.client will return"""
+        instance = MagicMock(spec=LogClient)
+        with patch("aliyun.log.LogClient", return_value=instance):
+            yield instance
+
+    @pytest.fixture
+    def client_property(self, monkeypatch):
+        """Make SLSClient.client return a given object for the test"""
+
+        def set_client(value):
+            monkeypatch.setattr(SLSClient, "client", property(lambda self: value))
+
+        return set_client
 
     def test_init(self):
         """Test SLSClient initialization"""
@@ -131,7 +205,7 @@ class TestSLSClient:
     @patch("aliyun.log.LogClient")
     def test_client_property_lazy_initialization(self, mock_log_client):
         """Test lazy initialization of SLS client"""
-        mock_client_instance = MagicMock()
+        mock_client_instance = MagicMock(spec=LogClient)
         mock_log_client.return_value = mock_client_instance
 
         # First access should create the client
@@ -152,77 +226,43 @@ class TestSLSClient:
 
     def test_client_property_import_error(self):
         """Test client property when aliyun-log-python-sdk is not available"""
-        with patch(
-            "builtins.__import__",
-            side_effect=ImportError("No module named 'aliyun.log'"),
-        ):
+        # A None entry in sys.modules makes the import raise ImportError
+        with patch.dict(sys.modules, {"aliyun.log": None}):
             client = self.client.client
             assert client is None
 
-    @patch("aliyun.log.LogClient")
-    def test_check_project_exists_success(self, mock_log_client):
+    def test_check_project_exists_success(self, mock_client_instance):
         """Test successful project existence check"""
-        mock_client_instance = MagicMock()
-        mock_log_client.return_value = mock_client_instance
-
         result = self.client.check_project_exists()
 
         assert result is True
         mock_client_instance.get_project.assert_called_once_with(self.config.project)
 
-    def test_check_project_exists_not_found(self):
+    def test_check_project_exists_not_found(self, client_property):
         """Test project existence check when project doesn't exist"""
         # Create a mock client instance
-        mock_client_instance = MagicMock()
-
-        # Create a mock LogException that behaves like the real one
-        class MockLogException(Exception):
-            pass
+        mock_client_instance = MagicMock(spec=LogClient)
 
         exception = MockLogException(
             "ProjectNotExist: The specified project does not exist"
         )
         mock_client_instance.get_project.side_effect = exception
 
-        # Mock both the client property and the LogException import
-        with (
-            patch.object(
-                SLSClient,
-                "client",
-                new_callable=lambda: property(lambda self: mock_client_instance),
-            ),
-            patch("builtins.__import__") as mock_import,
-        ):
-
-            def import_side_effect(name, *args, **kwargs):
-                if name == "aliyun.log.logexception":
-                    mock_module = MagicMock()
-                    mock_module.LogException = MockLogException
-                    return mock_module
-                else:
-                    return __import__(name, *args, **kwargs)
-
-            mock_import.side_effect = import_side_effect
-
+        # Mock the client property and the cached LogException class
+        client_property(mock_client_instance)
+        with patch("ulogger.sls._LogException", MockLogException):
             result = self.client.check_project_exists()
 
         assert result is False
 
-    def test_check_project_exists_no_client(self):
+    def test_check_project_exists_no_client(self, client_property):
         """Test project existence check when client is None"""
-        # Mock the client property to return None
-        with patch.object(
-            SLSClient, "client", new_callable=lambda: property(lambda self: None)
-        ):
-            result = self.client.check_project_exists()
-            assert result is False
+        client_property(None)
+        result = self.client.check_project_exists()
+        assert result is False
 
-    @patch("aliyun.log.LogClient")
-    def test_create_project_success(self, mock_log_client):
+    def test_create_project_success(self, mock_client_instance):
         """Test successful project creation"""
-        mock_client_instance = MagicMock()
-        mock_log_client.return_value = mock_client_instance
-
         result = self.client.create_project("Test project")
 
         assert result is True
@@ -230,59 +270,31 @@ class TestSLSClient:
             self.config.project, "Test project"
         )
 
-    def test_create_project_already_exists(self):
+    def test_create_project_already_exists(self, client_property):
         """Test project creation when project already exists"""
         # Create a mock client instance
-        mock_client_instance = MagicMock()
-
-        # Create a mock LogException that behaves like the real one
-        class MockLogException(Exception):
-            pass
+        mock_client_instance = MagicMock(spec=LogClient)
 
         exception = MockLogException(
             "ProjectAlreadyExist: The specified project already exists"
         )
         mock_client_instance.create_project.side_effect = exception
 
-        # Mock both the client property and the LogException import
-        with (
-            patch.object(
-                SLSClient,
-                "client",
-                new_callable=lambda: property(lambda self: mock_client_instance),
-            ),
-            patch("builtins.__import__") as mock_import,
-        ):
-
-            def import_side_effect(name, *args, **kwargs):
-                if name == "aliyun.log.logexception":
-                    mock_module = MagicMock()
-                    mock_module.LogException = MockLogException
-                    return mock_module
-                else:
-                    return __import__(name, *args, **kwargs)
-
-            mock_import.side_effect = import_side_effect
-
+        # Mock the client property and the cached LogException class
+        client_property(mock_client_instance)
+        with patch("ulogger.sls._LogException", MockLogException):
             result = self.client.create_project()
 
         assert result is True
 
-    def test_create_project_no_client(self):
+    def test_create_project_no_client(self, client_property):
         """Test project creation when client is None"""
-        # Mock the client property to return None
-        with patch.object(
-            SLSClient, "client", new_callable=lambda: property(lambda self: None)
-        ):
-            result = self.client.create_project()
-            assert result is False
+        client_property(None)
+        result = self.client.create_project()
+        assert result is False
 
-    @patch("aliyun.log.LogClient")
-    def test_check_logstore_exists_success(self, mock_log_client):
+    def test_check_logstore_exists_success(self, mock_client_instance):
         """Test successful logstore existence check"""
-        mock_client_instance = MagicMock()
-        mock_log_client.return_value = mock_client_instance
-
         result = self.client.check_logstore_exists()
 
         assert result is True
@@ -290,12 +302,8 @@ class TestSLSClient:
             self.config.project, self.config.logstore
         )
 
-    @patch("aliyun.log.LogClient")
-    def test_create_logstore_success(self, mock_log_client):
+    def test_create_logstore_success(self, mock_client_instance):
         """Test successful logstore creation"""
-        mock_client_instance = MagicMock()
-        mock_log_client.return_value = mock_client_instance
-
         result = self.client.create_logstore(ttl=60, shard_count=4)
 
         assert result is True
@@ -306,41 +314,62 @@ class TestSLSClient:
             shard_count=4,
         )
 
-    @patch("aliyun.log.LogClient")
-    def test_ensure_logstore_exists_success(self, mock_log_client):
-        """Test successful ensure logstore exists"""
-        mock_client_instance = MagicMock()
-        mock_log_client.return_value = mock_client_instance
-
-        # Mock both project and logstore exist
-        self.client.check_project_exists = MagicMock(return_value=True)
-        self.client.check_logstore_exists = MagicMock(return_value=True)
-
-        result = self.client.ensure_logstore_exists()
+    @pytest.mark.parametrize(
+        "project_exists,project_created,logstore_exists,logstore_created,expected",
+        [
+            # Both exist: nothing is created, so no create permission is needed
+            (True, False, True, False, True),
+            # Neither exists and both are created
+            (False, True, False, True, True),
+            # Project unavailable: the logstore is never checked
+            (False, False, True, True, False),
+            # Logstore unavailable
+            (True, False, False, False, False),
+        ],
+    )
+    def test_ensure_logstore_exists(
+        self,
+        project_exists,
+        project_created,
+        logstore_exists,
+        logstore_created,
+        expected,
+    ):
+        """Test creation is only attempted when the matching check fails"""
+        self.client.check_project_exists = MagicMock(return_value=project_exists)
+        self.client.create_project = MagicMock(return_value=project_created)
+        self.client.check_logstore_exists = MagicMock(return_value=logstore_exists)
+        self.client.create_logstore = MagicMock(return_value=logstore_created)
+
+        assert self.client.ensure_logstore_exists() is expected
+
+        project_ok = project_exists or project_created
+        assert self.client.create_project.called is not project_exists
+        assert self.client.check_logstore_exists.called is project_ok
+        assert self.client.create_logstore.called is (
+            project_ok and not logstore_exists
+        )
 
-        assert result is True
-        self.client.check_project_exists.assert_called_once()
-        self.client.check_logstore_exists.assert_called_once()
+    def test_ensure_logstore_exists_cached(self, mock_client_instance):
+        """Test a logstore ensured once is not requested again"""
+        assert self.client.ensure_logstore_exists() is True
+        assert SLSClient(self.config).ensure_logstore_exists() is True
 
-    @patch("aliyun.log.LogClient")
-    def test_ensure_logstore_exists_create_project_and_logstore(self, mock_log_client):
-        """Test ensure logstore exists when both need to be created"""
-        mock_client_instance = MagicMock()
-        mock_log_client.return_value = mock_client_instance
+        mock_client_instance.get_project.assert_called_once()
+        mock_client_instance.get_logstore.assert_called_once()
 
-        # Mock neither exists, but creation succeeds
-        self.client.check_project_exists = MagicMock(return_value=False)
-        self.client.create_project = MagicMock(return_value=True)
-        self.client.check_logstore_exists = MagicMock(return_value=False)
-        self.client.create_logstore = MagicMock(return_value=True)
+    def test_ensure_logstore_exists_existing_needs_no_create(
+        self, mock_client_instance
+    ):
+        """Test existing resources are used without any create request"""
 
         result = self.client.ensure_logstore_exists()
 
         assert result is True
-        self.client.check_project_exists.assert_called_once()
-        self.client.create_project.assert_called_once()
-        self.client.check_logstore_exists.assert_called_once()
-        self.client.create_logstore.assert_called_once()
+        mock_client_instance.get_project.assert_called_once()
+        mock_client_instance.get_logstore.assert_called_once()
+        mock_client_instance.create_project.assert_not_called()
+        mock_client_instance.create_logstore.assert_not_called()
 
     def test_ensure_logstore_exists_invalid_config(self):
         """Test ensure logstore exists with invalid configuration"""
@@ -351,13 +380,25 @@ class TestSLSClient:
 
         assert result is False
 
+    def test_diagnostics_use_logging_not_stdout(self, caplog, capsys):
+        """Test SLS diagnostics are logged instead of printed"""
+        invalid_client = SLSClient(SLSConfig())
+
+        with caplog.at_level(logging.WARNING, logger="ulogger.sls"):
+            invalid_client.ensure_logstore_exists()
+
+        assert "SLS configuration is incomplete" in caplog.text
+        assert capsys.readouterr().out == ""
+
 
 class TestSLSPropagateHandler:
     """Test SLSPropagateHandler class"""
 
-    def setup_method(self):
-        """Setup for each test method"""
-        self.config = SLSConfig(
+    @pytest.fixture(autouse=True, scope="class")
+    @classmethod
+    def _config(cls):
+        """Share one config; tests derive variants with replace()"""
+        cls.config = SLSConfig(
             endpoint="https://test.log.aliyuncs.com",
             access_key_id="test_key",
             access_key_secret="test_secret",
@@ -368,7 +409,7 @@ class TestSLSPropagateHandler:
 
     def test_init(self):
         """Test SLSPropagateHandler initialization"""
-        client = MagicMock()
+        client = MagicMock(spec=LogClient)
         handler = SLSPropagateHandler(
             client,
             self.config,
@@ -381,7 +422,7 @@ class TestSLSPropagateHandler:
 
     def test_emit(self):
         """Test emit method"""
-        client = MagicMock()
+        client = MagicMock(spec=LogClient)
         log_item = MagicMock()
         put_logs_request = MagicMock()
         put_logs_request.set_logtags = MagicMock()
@@ -394,18 +435,11 @@ class TestSLSPropagateHandler:
             log_exception_cls=Exception,
         )
 
-        record = logging.LogRecord(
-            name="test",
-            level=logging.INFO,
-            pathname="test.py",
-            lineno=1,
-            msg="Test message",
-            args=(),
-            exc_info=None,
-        )
+        record = self._make_record("Test message")
         record.extra = {"custom": "value", "tag": "billing", "service": "demo"}
 
         handler.emit(record)
+        handler.flush()
 
         assert log_item.set_time.call_count == 1
         assert log_item.set_time_nano_part.call_count == 1
@@ -419,27 +453,613 @@ class TestSLSPropagateHandler:
         assert int(seq, 16) >= 1
         client.put_logs.assert_called_once_with(put_logs_request)
 
-    def test_emit_logger_disabled(self):
-        """Test emit method when logger is disabled for the level"""
+    def _make_record(self, msg: str, level: int = logging.INFO) -> logging.LogRecord:
+        return logging.LogRecord(
+            name="test",
+            level=level,
+            pathname="test.py",
+            lineno=1,
+            msg=msg,
+            args=(),
+            exc_info=None,
+        )
+
+    def test_emit_batches_records(self):
+        """Test queued records are sent together in one request"""
+        client = MagicMock(spec=LogClient)
+        put_logs_request_cls = MagicMock()
+
         handler = SLSPropagateHandler(
-            None,
+            client,
+            self.config,
+            log_item_cls=MagicMock,
+            put_logs_request_cls=put_logs_request_cls,
+            log_exception_cls=Exception,
+            flush_interval=60,
+        )
+
+        for index in range(3):
+            handler.emit(self._make_record(f"message {index}"))
+        handler.flush()
+
+        client.put_logs.assert_called_once()
+        put_logs_request_cls.assert_called_once()
+        assert len(put_logs_request_cls.call_args.kwargs["logitems"]) == 3
+
+    def test_sdk_log_items_skip_contents_deepcopy(self):
+        """Test SDK log items take the contents list without deep-copying it"""
+        client = MagicMock(spec=LogClient)
+        put_logs_request_cls = MagicMock()
+
+        handler = SLSPropagateHandler(
+            client,
+            self.config,
+            log_item_cls=LogItem,
+            put_logs_request_cls=put_logs_request_cls,
+            log_exception_cls=Exception,
+        )
+
+        with patch("aliyun.log.logitem.copy.deepcopy") as mock_deepcopy:
+            handler.emit(self._make_record("direct"))
+            handler.flush()
+
+        mock_deepcopy.assert_not_called()
+        (log_item,) = put_logs_request_cls.call_args.kwargs["logitems"]
+        assert dict(log_item.get_contents())["message"] == "direct"
+
+    def test_emit_splits_by_batch_size(self):
+        """Test flush sends at most batch_size records per request"""
+        client = MagicMock(spec=LogClient)
+        put_logs_request_cls = MagicMock()
+
+        handler = SLSPropagateHandler(
+            client,
+            self.config,
+            log_item_cls=MagicMock,
+            put_logs_request_cls=put_logs_request_cls,
+            log_exception_cls=Exception,
+            batch_size=2,
+        )
+
+        for index in range(5):
+            handler.emit(self._make_record(f"message {index}"))
+        handler.close()
+
+        sizes = [len(c.kwargs["logitems"]) for c in put_logs_request_cls.call_args_list]
+        assert sum(sizes) == 5
+        assert max(sizes) <= 2
+
+    def test_batch_limits_capped_at_put_logs_maximum(self):
+        """Test batch settings cannot exceed what one PutLogs request accepts"""
+        handler = SLSPropagateHandler(
+            MagicMock(),
             self.config,
             log_item_cls=MagicMock,
             put_logs_request_cls=MagicMock,
             log_exception_cls=Exception,
+            batch_size=10000,
+            max_batch_bytes=64 * 1024 * 1024,
         )
 
-        record = logging.LogRecord(
-            name="test",
-            level=logging.DEBUG,
-            pathname="test.py",
-            lineno=1,
-            msg="Debug message",
-            args=(),
-            exc_info=None,
+        assert handler._batch_size == 4096
+        assert handler._max_batch_bytes == 5 * 1024 * 1024
+
+    def test_emit_splits_by_batch_bytes(self):
+        """Test a batch never exceeds max_batch_bytes unless it is a single record"""
+        client = MagicMock(spec=LogClient)
+        put_logs_request_cls = MagicMock()
+
+        handler = SLSPropagateHandler(
+            client,
+            self.config,
+            log_item_cls=MagicMock,
+            put_logs_request_cls=put_logs_request_cls,
+            log_exception_cls=Exception,
+            flush_interval=60,
+            max_batch_bytes=1,
         )
 
-        handler.emit(record)
+        for index in range(3):
+            handler.emit(self._make_record(f"message {index}"))
+        handler.flush()
+
+        sizes = [len(c.kwargs["logitems"]) for c in put_logs_request_cls.call_args_list]
+        assert sizes == [1, 1, 1]
+
+    def test_send_retries_with_same_pack_id(self):
+        """Test failed put_logs calls are retried with the same request"""
+        client = MagicMock(spec=LogClient)
+        client.put_logs.side_effect = [Exception("busy"), Exception("busy"), None]
+        put_logs_request = MagicMock()
+        put_logs_request_cls = MagicMock(return_value=put_logs_request)
+
+        handler = SLSPropagateHandler(
+            client,
+            self.config,
+            log_item_cls=MagicMock,
+            put_logs_request_cls=put_logs_request_cls,
+            log_exception_cls=Exception,
+            retry_backoff=0,
+        )
+
+        record = self._make_record("retried %s")
+        record.args = ("once",)
+        with patch.object(record, "getMessage", wraps=record.getMessage) as get_message:
+            handler.emit(record)
+            handler.flush()
+
+        assert client.put_logs.call_count == 3
+        # Retries resend the same request; nothing is rebuilt or reformatted
+        put_logs_request_cls.assert_called_once()
+        put_logs_request.set_logtags.assert_called_once()
+        get_message.assert_called_once()
+
+    def test_send_gives_up_after_max_retries(self, caplog):
+        """Test the failure is logged once retries are exhausted"""
+        client = MagicMock(spec=LogClient)
+        client.put_logs.side_effect = Exception("down")
+
+        handler = SLSPropagateHandler(
+            client,
+            self.config,
+            log_item_cls=MagicMock,
+            put_logs_request_cls=MagicMock(),
+            log_exception_cls=Exception,
+            max_retries=1,
+            retry_backoff=0,
+        )
+
+        with caplog.at_level(logging.WARNING, logger="ulogger.sls"):
+            handler.emit(self._make_record("lost"))
+            handler.flush()
+
+        assert client.put_logs.call_count == 2
+        assert "down" in caplog.text
+
+    def test_emit_without_nano_support(self):
+        """Test log items lacking set_time_nano_part still get sent"""
+        client = MagicMock(spec=LogClient)
+        log_items = []
+
+        class LegacyLogItem:
+            def __init__(self):
+                self.time = None
+                log_items.append(self)
+
+            def set_time(self, seconds):
+                self.time = seconds
+
+            def set_contents(self, contents):
+                self.contents = contents
+
+        handler = SLSPropagateHandler(
+            client,
+            self.config,
+            log_item_cls=LegacyLogItem,
+            put_logs_request_cls=MagicMock(),
+            log_exception_cls=Exception,
+        )
+
+        handler.emit(self._make_record("first"))
+        handler.emit(self._make_record("second"))
+        handler.flush()
+
+        assert len(log_items) == 2
+        assert all(item.time is not None for item in log_items)
+        assert dict(log_items[0].contents)["service"] == "test_service"
+
+    def test_emit_drop_oldest_on_overflow(self):
+        """Test the oldest record is dropped when the queue is full"""
+        client = MagicMock(spec=LogClient)
+        log_items = []
+
+        def make_log_item():
+            item = MagicMock()
+            log_items.append(item)
+            return item
+
+        handler = SLSPropagateHandler(
+            client,
+            self.config,
+            log_item_cls=make_log_item,
+            put_logs_request_cls=MagicMock(),
+            log_exception_cls=Exception,
+            flush_interval=60,
+            max_queue_size=2,
+        )
+
+        # A full queue wakes the dispatcher; keep it away from this handler
+        # (as during a bootstrap) so the third record finds the queue full
+        handler._ready.clear()
+        for index in range(3):
+            handler.emit(self._make_record(f"message {index}"))
+        handler._ready.set()
+        handler.flush()
+
+        messages = [
+            dict(item.set_contents.call_args[0][0])["message"] for item in log_items
+        ]
+        assert messages == ["message 1", "message 2"]
+        assert handler.dropped == 1
+
+    def test_full_queue_wakes_dispatcher(self):
+        """Test filling the queue wakes the dispatcher before the interval"""
+        handler = SLSPropagateHandler(
+            MagicMock(spec=LogClient),
+            self.config,
+            log_item_cls=MagicMock(),
+            put_logs_request_cls=MagicMock(),
+            log_exception_cls=Exception,
+            flush_interval=60,
+            max_queue_size=2,
+        )
+        handler._ready.clear()
+
+        with patch("ulogger.sls._DISPATCHER.wake") as wake:
+            handler.emit(self._make_record("message 0"))
+            wake.reset_mock()
+            handler.emit(self._make_record("message 1"))
+
+        wake.assert_called_once_with()
+        handler._ready.set()
+        handler.close()
+
+    def test_close_flushes_pending_records(self):
+        """Test close sends queued records"""
+        client = MagicMock(spec=LogClient)
+
+        handler = SLSPropagateHandler(
+            client,
+            self.config,
+            log_item_cls=MagicMock,
+            put_logs_request_cls=MagicMock(),
+            log_exception_cls=Exception,
+            flush_interval=60,
+        )
+
+        handler.emit(self._make_record("pending"))
+        handler.close()
+
+        client.put_logs.assert_called_once()
+
+    def test_handlers_share_dispatcher_thread(self):
+        """Test all handlers are flushed by one background thread"""
+        clients = [MagicMock(), MagicMock()]
+        handlers = [
+            SLSPropagateHandler(
+                client,
+                self.config,
+                log_item_cls=MagicMock,
+                put_logs_request_cls=MagicMock(),
+                log_exception_cls=Exception,
+                flush_interval=0.01,
+            )
+            for client in clients
+        ]
+
+        for handler in handlers:
+            handler.emit(self._make_record("timed flush"))
+
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and not all(
+            client.put_logs.called for client in clients
+        ):
+            time.sleep(0.01)
+
+        assert all(client.put_logs.call_count == 1 for client in clients)
+        dispatchers = [
+            thread
+            for thread in threading.enumerate()
+            if thread.name == "ulogger-sls-dispatcher"
+        ]
+        assert len(dispatchers) == 1
+
+        for handler in handlers:
+            handler.close()
+
+    def test_failing_handler_does_not_stall_dispatcher(self):
+        """Test retry backoff is scheduled rather than slept on the dispatcher"""
+        failing_client = MagicMock(spec=LogClient)
+        failing_client.put_logs.side_effect = Exception("down")
+        healthy_client = MagicMock(spec=LogClient)
+        failing, healthy = (
+            SLSPropagateHandler(
+                client,
+                self.config,
+                log_item_cls=MagicMock,
+                put_logs_request_cls=MagicMock(),
+                log_exception_cls=Exception,
+                flush_interval=0.01,
+                max_retries=1,
+                retry_backoff=60,
+            )
+            for client in (failing_client, healthy_client)
+        )
+
+        failing.emit(self._make_record("rejected"))
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and not failing_client.put_logs.called:
+            time.sleep(0.01)
+        healthy.emit(self._make_record("accepted"))
+        while time.monotonic() < deadline and not healthy_client.put_logs.called:
+            time.sleep(0.01)
+
+        healthy_client.put_logs.assert_called_once()
+        failing_client.put_logs.assert_called_once()
+
+        # close() still makes the final attempt, without waiting for the backoff
+        failing.close()
+        healthy.close()
+        assert failing_client.put_logs.call_count == 2
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+    def test_forked_child_restarts_dispatcher(self):
+        """Test a forked child sends its own records on a new dispatcher"""
+        client = MagicMock(spec=LogClient)
+        messages = []
+
+        def make_log_item():
+            item = MagicMock()
+            item.set_contents.side_effect = lambda contents: messages.append(
+                dict(contents)["message"]
+            )
+            return item
+
+        handler = SLSPropagateHandler(
+            client,
+            self.config,
+            log_item_cls=make_log_item,
+            put_logs_request_cls=MagicMock(),
+            log_exception_cls=Exception,
+            batch_size=2,
+            flush_interval=60,
+        )
+        handler.emit(self._make_record("parent"))
+
+        pid = os.fork()
+        if pid == 0:
+            # A full batch is only sent if the child has a running dispatcher
+            handler.emit(self._make_record("child 1"))
+            handler.emit(self._make_record("child 2"))
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline and not client.put_logs.called:
+                time.sleep(0.01)
+            os._exit(0 if messages == ["child 1", "child 2"] else 1)
+
+        _, status = os.waitpid(pid, 0)
+        handler.close()
+
+        assert os.waitstatus_to_exitcode(status) == 0
+        assert messages == ["parent"]
+
+    def test_block_policy_waits_for_space(self):
+        """Test the block policy waits for the dispatcher instead of dropping"""
+        client = MagicMock(spec=LogClient)
+        put_logs_request_cls = MagicMock()
+
+        handler = SLSPropagateHandler(
+            client,
+            self.config,
+            log_item_cls=MagicMock,
+            put_logs_request_cls=put_logs_request_cls,
+            log_exception_cls=Exception,
+            flush_interval=60,
+            max_queue_size=2,
+            overflow_policy="block",
+        )
+
+        for index in range(5):
+            handler.emit(self._make_record(f"message {index}"))
+        handler.close()
+
+        sizes = [len(c.kwargs["logitems"]) for c in put_logs_request_cls.call_args_list]
+        assert sum(sizes) == 5
+
+    def test_flush_waits_for_in_flight_batches(self):
+        """Test flush() returns only after batches sent by other threads"""
+        started = threading.Event()
+        release = threading.Event()
+        client = MagicMock(spec=LogClient)
+
+        def slow_put_logs(request):
+            started.set()
+            release.wait(5)
+
+        client.put_logs.side_effect = slow_put_logs
+
+        handler = SLSPropagateHandler(
+            client,
+            self.config,
+            log_item_cls=MagicMock,
+            put_logs_request_cls=MagicMock,
+            log_exception_cls=Exception,
+            flush_interval=60,
+        )
+        handler.emit(self._make_record("in flight"))
+
+        sender = threading.Thread(target=handler.flush)
+        sender.start()
+        assert started.wait(5)
+
+        waiter = threading.Thread(target=handler.flush)
+        waiter.start()
+        waiter.join(0.1)
+        assert waiter.is_alive()
+
+        release.set()
+        sender.join(5)
+        waiter.join(5)
+        assert not waiter.is_alive()
+        assert client.put_logs.call_count == 1
+
+    def test_invalid_overflow_policy(self):
+        """Test unknown overflow policies are rejected"""
+        with pytest.raises(ValueError):
+            SLSPropagateHandler(
+                MagicMock(),
+                self.config,
+                log_item_cls=MagicMock,
+                put_logs_request_cls=MagicMock,
+                log_exception_cls=Exception,
+                overflow_policy="unknown",
+            )
+
+    def test_build_contents_with_exception(self):
+        """Test exception text is included in the contents"""
+        handler = SLSPropagateHandler(
+            MagicMock(),
+            self.config,
+            log_item_cls=MagicMock,
+            put_logs_request_cls=MagicMock,
+            log_exception_cls=Exception,
+        )
+
+        try:
+            raise RuntimeError("boom")
+        except RuntimeError:
+            record = self._make_record("failed")
+            record.exc_info = sys.exc_info()
+
+        contents = dict(handler._build_contents(record))
+        assert contents["message"] == "failed"
+        assert "RuntimeError: boom" in contents["exc"]
+        assert contents["path"] == "test.py"
+
+    def test_build_contents_message(self):
+        """Test plain messages pass through and %-style args are applied"""
+        handler = SLSPropagateHandler(
+            MagicMock(),
+            self.config,
+            log_item_cls=MagicMock,
+            put_logs_request_cls=MagicMock,
+            log_exception_cls=Exception,
+        )
+        record = self._make_record("100% plain")
+        assert dict(handler._build_contents(record))["message"] == "100% plain"
+
+        record = self._make_record("user %s, count %d")
+        record.args = ("alice", 3)
+        assert dict(handler._build_contents(record))["message"] == "user alice, count 3"
+
+    def test_build_contents_extra_json_optional(self):
+        """Test the combined "extra" JSON field can be switched off"""
+        record = self._make_record("with extras")
+        record.extra = {"user": "alice", "count": 3, "extra": "kept"}
+
+        handler = SLSPropagateHandler(
+            MagicMock(),
+            self.config,
+            log_item_cls=MagicMock,
+            put_logs_request_cls=MagicMock,
+            log_exception_cls=Exception,
+        )
+        contents = dict(handler._build_contents(record))
+        assert json.loads(contents["extra"]) == {
+            "user": "alice",
+            "count": "3",
+            "extra": "kept",
+            "service": "test_service",
+        }
+
+        config = replace(self.config, include_extra_json=False)
+        handler = SLSPropagateHandler(
+            MagicMock(),
+            config,
+            log_item_cls=MagicMock,
+            put_logs_request_cls=MagicMock,
+            log_exception_cls=Exception,
+        )
+        contents = dict(handler._build_contents(record))
+        assert contents["user"] == "alice"
+        assert contents["count"] == "3"
+        assert contents["extra"] == "kept"
+
+    def test_build_contents_reuses_id_strings(self):
+        """Test process/thread/lineno strings are cached and the cache is bounded"""
+        handler = SLSPropagateHandler(
+            MagicMock(),
+            self.config,
+            log_item_cls=MagicMock,
+            put_logs_request_cls=MagicMock,
+            log_exception_cls=Exception,
+        )
+        record = self._make_record("cached")
+
+        first = dict(handler._build_contents(record))
+        second = dict(handler._build_contents(record))
+
+        assert first["process"] == str(record.process)
+        assert first["thread"] == str(record.thread)
+        assert first["lineno"] == "1"
+        assert second["thread"] is first["thread"]
+
+        for value in range(handler._INT_STRINGS_MAX + 10):
+            handler._int_str(value)
+        assert len(handler._int_strings) <= handler._INT_STRINGS_MAX
+
+    def test_resolve_timestamp(self):
+        """Test timestamps split into seconds and nanoseconds"""
+        record = self._make_record("stamped")
+
+        record.created = 1700000000.5
+        assert SLSPropagateHandler._resolve_timestamp(record) == (
+            1700000000,
+            500_000_000,
+        )
+
+    def test_serialize_value_scalars(self):
+        """Test scalars and their subclasses are stringified"""
+
+        class Name(str):
+            pass
+
+        serialize = SLSPropagateHandler._serialize_value
+        assert serialize("text") == "text"
+        assert serialize(42) == "42"
+        assert serialize(1.5) == "1.5"
+        assert serialize(True) == "True"
+        assert serialize(Name("sub")) == "sub"
+        assert serialize(None) == "null"
+
+    @pytest.mark.parametrize("use_orjson", [True, False])
+    def test_serialize_value_json(self, use_orjson):
+        """Test structured values serialize to JSON with or without orjson"""
+        value = {"name": "测试", 1: [1.5, None], None: {"nested": True}}
+        if use_orjson:
+            pytest.importorskip("orjson")
+            serialize = SLSPropagateHandler._serialize_value
+        else:
+            serialize = patch("ulogger.sls.orjson", None)(
+                SLSPropagateHandler._serialize_value
+            )
+
+        # Identical text either way, so SLS queries do not depend on the extra
+        assert (
+            serialize(value) == '{"name":"测试","1":[1.5,null],"null":{"nested":true}}'
+        )
+        # Too large for orjson: handed to the stdlib with the same separators
+        assert serialize([2**70, "x"]) == f'[{2**70},"x"]'
+
+    def test_emit_logger_disabled(self):
+        """Test records below the handler level are dropped before any work"""
+        client = MagicMock(spec=LogClient)
+        handler = SLSPropagateHandler(
+            client,
+            self.config,
+            log_item_cls=MagicMock,
+            put_logs_request_cls=MagicMock,
+            log_exception_cls=Exception,
+        )
+        handler.setLevel(logging.INFO)
+
+        record = self._make_record("Debug message", logging.DEBUG)
+
+        with patch.object(handler, "_build_contents") as mock_build:
+            handler.emit(record)
+        handler.flush()
+
+        mock_build.assert_not_called()
+        client.put_logs.assert_not_called()
 
     def test_emit_no_logger(self):
         """Test emit method when sls_logger is None"""
@@ -451,15 +1071,7 @@ class TestSLSPropagateHandler:
             log_exception_cls=Exception,
         )
 
-        record = logging.LogRecord(
-            name="test",
-            level=logging.INFO,
-            pathname="test.py",
-            lineno=1,
-            msg="Test message",
-            args=(),
-            exc_info=None,
-        )
+        record = self._make_record("Test message")
 
         # Should not raise an exception
         handler.emit(record)
@@ -467,9 +1079,9 @@ class TestSLSPropagateHandler:
     @patch("ulogger.sls.SLSClient")
     def test_create_success(self, mock_sls_client_class):
         """Test successful handler creation"""
-        mock_client_instance = MagicMock()
+        mock_client_instance = MagicMock(spec=SLSClient)
         mock_client_instance.ensure_logstore_exists.return_value = True
-        mock_client_instance.client = MagicMock()
+        mock_client_instance.client = MagicMock(spec=LogClient)
         mock_sls_client_class.return_value = mock_client_instance
 
         handler = SLSPropagateHandler.create(self.config)
@@ -478,19 +1090,125 @@ class TestSLSPropagateHandler:
         assert handler._client == mock_client_instance.client
         mock_client_instance.ensure_logstore_exists.assert_called_once()
 
-    def test_create_invalid_config(self):
+    @patch("ulogger.sls.SLSClient")
+    def test_create_skip_logstore_check(self, mock_sls_client_class):
+        """Test the logstore check can be skipped entirely"""
+        mock_client_instance = MagicMock(spec=SLSClient)
+        mock_client_instance.client = MagicMock(spec=LogClient)
+        mock_sls_client_class.return_value = mock_client_instance
+
+        config = replace(self.config, ensure_logstore="skip")
+        handler = SLSPropagateHandler.create(config)
+
+        assert isinstance(handler, SLSPropagateHandler)
+        mock_client_instance.ensure_logstore_exists.assert_not_called()
+
+    @patch("ulogger.sls.SLSClient")
+    def test_create_batching_from_config(self, mock_sls_client_class):
+        """Test the batching settings are taken from the config"""
+        mock_client_instance = MagicMock(spec=SLSClient)
+        mock_client_instance.client = MagicMock(spec=LogClient)
+        mock_sls_client_class.return_value = mock_client_instance
+
+        config = replace(
+            self.config, ensure_logstore="skip", batch_size=500, flush_interval=2.0
+        )
+        handler = SLSPropagateHandler.create(config)
+
+        assert handler._batch_size == 500
+        assert handler._flush_interval == 2.0
+
+    @patch("ulogger.sls.SLSClient")
+    def test_create_background_bootstrap(self, mock_sls_client_class):
+        """Test records queue while the logstore is checked in the background"""
+        release = threading.Event()
+        mock_client_instance = MagicMock(spec=SLSClient)
+        mock_client_instance.ensure_logstore_exists.side_effect = lambda: release.wait(
+            5
+        )
+        mock_client_instance.client = MagicMock(spec=LogClient)
+        mock_sls_client_class.return_value = mock_client_instance
+
+        config = replace(self.config, ensure_logstore="background")
+        handler = SLSPropagateHandler.create(config)
+
+        assert isinstance(handler, SLSPropagateHandler)
+        handler.emit(self._make_record("early"))
+        assert mock_client_instance.client.put_logs.call_count == 0
+
+        release.set()
+        handler.flush()
+        assert mock_client_instance.client.put_logs.call_count == 1
+        handler.close()
+
+    @patch("ulogger.sls.SLSClient")
+    def test_flush_bounded_while_bootstrapping(self, mock_sls_client_class, caplog):
+        """Test flush() gives up waiting for a bootstrap that does not finish"""
+        release = threading.Event()
+        mock_client_instance = MagicMock(spec=SLSClient)
+        mock_client_instance.ensure_logstore_exists.side_effect = lambda: release.wait(
+            5
+        )
+        mock_client_instance.client = MagicMock(spec=LogClient)
+        mock_sls_client_class.return_value = mock_client_instance
+
+        config = replace(self.config, ensure_logstore="background")
+        handler = SLSPropagateHandler.create(config)
+        handler.emit(self._make_record("early"))
+
+        with patch.object(handler, "_BOOTSTRAP_WAIT", 0.01):
+            with caplog.at_level(logging.WARNING, logger="ulogger.sls"):
+                handler.flush()
+
+        assert mock_client_instance.client.put_logs.call_count == 0
+        assert "1 records not flushed" in caplog.text
+
+        release.set()
+        handler.close()
+        assert mock_client_instance.client.put_logs.call_count == 1
+
+    @patch("ulogger.sls.SLSClient")
+    def test_create_background_bootstrap_failure(self, mock_sls_client_class, caplog):
+        """Test queued records are discarded when the background check fails"""
+        release = threading.Event()
+        mock_client_instance = MagicMock(spec=SLSClient)
+        mock_client_instance.ensure_logstore_exists.side_effect = lambda: (
+            release.wait(5) and False
+        )
+        mock_client_instance.client = MagicMock(spec=LogClient)
+        mock_sls_client_class.return_value = mock_client_instance
+
+        config = replace(self.config, ensure_logstore="background")
+        handler = SLSPropagateHandler.create(config)
+        handler.emit(self._make_record("early"))
+
+        with caplog.at_level(logging.ERROR, logger="ulogger.sls"):
+            release.set()
+            handler.flush()
+        handler.emit(self._make_record("late"))
+        handler.close()
+
+        assert mock_client_instance.client.put_logs.call_count == 0
+        assert "discarding 1 queued records" in caplog.text
+
+    def test_create_invalid_config(self, caplog):
         """Test handler creation with invalid configuration"""
-        invalid_config = SLSConfig()  # Empty config
+        invalid_config = SLSConfig(endpoint="https://test.log.aliyuncs.com")
 
-        handler = SLSPropagateHandler.create(invalid_config)
+        with caplog.at_level(logging.WARNING, logger="ulogger.sls"):
+            handler = SLSPropagateHandler.create(invalid_config)
 
         assert handler is None
+        assert (
+            "missing config fields: access_key_id, access_key_secret, project, logstore"
+            in caplog.text
+        )
 
     def test_create_setup_failure(self):
         """Test handler creation when SLS setup fails"""
 
         with patch("ulogger.sls.SLSClient") as mock_client_class:
-            mock_client = MagicMock()
+            mock_client = MagicMock(spec=SLSClient)
             mock_client.ensure_logstore_exists.return_value = False
             mock_client_class.return_value = mock_client
 
@@ -513,16 +1231,11 @@ class TestSLSIntegration:
             service_name="integration_test",
         )
 
-        # Mock all external dependencies
-        with (
-            patch("ulogger.sls.SLSClient") as mock_client_class,
-            patch("aliyun.log.LogItem", autospec=True),
-            patch("aliyun.log.PutLogsRequest", autospec=True),
-            patch("aliyun.log.logexception.LogException", new=Exception),
-        ):
-            mock_client = MagicMock()
+        # Only the SLS client talks to the network; nothing is emitted here
+        with patch("ulogger.sls.SLSClient") as mock_client_class:
+            mock_client = MagicMock(spec=SLSClient)
             mock_client.ensure_logstore_exists.return_value = True
-            mock_client.client = MagicMock()
+            mock_client.client = MagicMock(spec=LogClient)
             mock_client_class.return_value = mock_client
 
             handler = SLSPropagateHandler.create(config)